@@ -0,0 +1,690 @@
+import re
+import json
+import uuid
+import time
+import yaml
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl, unquote
+
+class Spec:
+    def __init__(self, path: str):
+        with open(path, encoding='utf-8') as f:
+            self.document = yaml.safe_load(f)
+
+        self.prefix = urlparse(self.document['servers'][0]['url']).path.rstrip('/')
+        self.schemas = self.document.get('components', {}).get('schemas', {})
+
+        self.routes: list[tuple[str, re.Pattern, str, set[str]]] = []
+        for path, item in self.document['paths'].items():
+            pattern = re.compile('^' + re.sub(r'\\{(\w+)\\}', r'(?P<\1>[^/]+)', re.escape(path)) + '$')
+            for method, operation in item.items():
+                if method not in ('get', 'post', 'put', 'patch', 'delete'):
+                    continue
+
+                parameters = set()
+                for parameter in item.get('parameters', []) + operation.get('parameters', []):
+                    if '$ref' in parameter:
+                        parameter = self.resolve(parameter['$ref'])
+                    if parameter.get('in') == 'query':
+                        parameters.add(parameter['name'])
+
+                self.routes.append((method.upper(), pattern, operation['operationId'], parameters))
+
+        # Static paths win over templated ones, e.g. /manga/random over /manga/{id}
+        self.routes.sort(key=lambda v: v[1].pattern.count('(?P'))
+
+    def resolve(self, ref: str):
+        node = self.document
+        for part in ref.removeprefix('#/').split('/'):
+            node = node[part]
+
+        return node
+
+    def match(self, method: str, path: str):
+        if not path.startswith(self.prefix):
+            return None
+
+        path = path[len(self.prefix):]
+        for route_method, pattern, operation_id, parameters in self.routes:
+            if route_method != method:
+                continue
+
+            match = pattern.match(path)
+            if match:
+                return operation_id, {k: unquote(unquote(v)) for k, v in match.groupdict().items()}, parameters
+
+        return None
+
+    def model(self, name: str, values: dict):
+        return {**self.example(self.schemas[name]), **values}
+
+    def example(self, schema: dict):
+        if '$ref' in schema:
+            schema = self.resolve(schema['$ref'])
+
+        match schema.get('type'):
+            case 'object':
+                return {
+                    k: self.example(schema['properties'][k])
+                    for k in schema.get('required', []) if k in schema.get('properties', {})
+                }
+            case 'array':
+                return []
+            case 'integer' | 'number':
+                return 0
+            case 'boolean':
+                return False
+            case 'string':
+                if schema.get('format') == 'date-time':
+                    return now_of()
+
+                return ''
+
+        return None
+
+class Error(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+
+        self.status = status
+
+class Stats:
+    def __init__(self):
+        self.operations: dict[str, dict[str, float]] = {}
+        self.lock = threading.Lock()
+
+    def add(self, operation_id: str, bytes_in: int, bytes_out: int, seconds: float, items: int = 0):
+        with self.lock:
+            stats = self.operations.setdefault(
+                operation_id,
+                {'count': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0, 'items': 0}
+            )
+            stats['count'] += 1
+            stats['bytes_in'] += bytes_in
+            stats['bytes_out'] += bytes_out
+            stats['seconds'] += seconds
+            stats['items'] += items
+
+    def snapshot(self):
+        with self.lock:
+            return {k: dict(v) for k, v in self.operations.items()}
+
+class CountingWriter:
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def write(self, data: bytes):
+        self.count += len(data)
+
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    server: 'MockServer'
+
+    def setup(self):
+        super().setup()
+
+        self.wfile = CountingWriter(self.wfile)
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_one(self, method: str):
+        started = time.perf_counter()
+
+        url = urlparse(self.path)
+        query: dict[str, list[str]] = {}
+        for k, v in parse_qsl(url.query, keep_blank_values=True):
+            query.setdefault(k, []).append(unquote(v))
+
+        body = b''
+        if self.headers.get('Content-Length'):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+
+        self.wfile.count = 0
+
+        bytes_in = len(self.requestline) + len(str(self.headers)) + len(body)
+
+        status, headers, payload, operation_id = 200, {}, None, None
+        try:
+            match = self.server.spec.match(method, url.path)
+            if match:
+                operation_id, path_params, parameters = match
+
+                for k in query:
+                    if k not in parameters and k.split('[')[0] not in parameters:
+                        raise Error(400, f'Unknown query parameter {k}')
+
+                handler = getattr(self.server.store, operation_id.replace('-', '_'), None)
+                if not handler:
+                    raise Error(501, f'Operation {operation_id} is not mocked')
+
+                data = json.loads(body) if body else None
+                status, headers, payload = handler(path_params, query, data)
+            else:
+                extra = self.server.extra.get((method, url.path))
+                if not extra:
+                    raise Error(404, f'{method} {url.path} is not in the spec')
+
+                operation_id = extra.__name__
+                status, headers, payload = extra(query, body)
+        except Error as e:
+            status, payload = e.status, {'message': str(e)}
+
+        content = json.dumps(payload).encode() if payload is not None else b''
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for k, v in headers.items():
+            self.send_header(k, str(v))
+        self.end_headers()
+        self.wfile.write(content)
+
+        if operation_id and not url.path.startswith('/_'):
+            items = len(payload) if isinstance(payload, list) else 0
+            if isinstance(payload, dict) and isinstance(payload.get('data'), list):
+                items = len(payload['data'])
+
+            self.server.stats.add(operation_id, bytes_in, self.wfile.count, time.perf_counter() - started, items)
+
+    def do_GET(self):
+        self.handle_one('GET')
+
+    def do_POST(self):
+        self.handle_one('POST')
+
+    def do_PATCH(self):
+        self.handle_one('PATCH')
+
+    def do_PUT(self):
+        self.handle_one('PUT')
+
+    def do_DELETE(self):
+        self.handle_one('DELETE')
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, spec: Spec, store, port: int = 0):
+        super().__init__(('127.0.0.1', port), Handler)
+
+        self.spec = spec
+        self.store = store
+        self.stats = Stats()
+        self.extra = {('GET', '/_stats'): self.stats_route}
+
+    def stats_route(self, query, body):
+        return 200, {}, self.stats.snapshot()
+
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}{self.spec.prefix}'
+
+#
+# ComicBagi
+#
+
+class ComicBagiStore:
+    page_limit_default = 10
+    page_limit_max = 100
+
+    def __init__(self, spec: Spec):
+        self.spec = spec
+
+        self.languages: dict[str, dict] = {}
+        self.websites: dict[str, dict] = {}
+        self.links: dict[str, dict] = {}
+        self.comics: dict[str, dict] = {}
+
+        self.lock = threading.Lock()
+
+    def oauth_token(self, query, body):
+        return 200, {}, {'access_token': 'benchmark', 'token_type': 'Bearer', 'expires_in': 86400}
+
+    def page(self, items: list, query: dict[str, list[str]]):
+        page = int(first_of(query, 'page') or 1)
+        limit = min(int(first_of(query, 'limit') or self.page_limit_default), self.page_limit_max)
+
+        headers = {'X-Total-Count': len(items), 'X-Pagination-Limit': limit}
+
+        return 200, headers, items[(page-1)*limit:page*limit]
+
+    def add(self, collection: dict, key: str, value: dict):
+        with self.lock:
+            if key in collection:
+                raise Error(409, f'{key} already exists')
+
+            collection[key] = value
+
+        return value
+
+    def get(self, collection: dict, key: str):
+        if key not in collection:
+            raise Error(404, f'{key} not found')
+
+        return collection[key]
+
+    def link(self, website_host: str, relative_reference: str | None):
+        href = f'{website_host}{relative_reference or ""}'
+        link = self.links.get(href)
+
+        return {
+            'websiteHost': website_host,
+            'websiteName': self.websites.get(website_host, {}).get('name', ''),
+            'relativeReference': relative_reference,
+            'itemLanguageCount': len(link['languages']) if link else 0
+        }
+
+    def destination_link(self, website_host: str, relative_reference: str | None, released_at: str | None):
+        return {
+            'ulid': uuid.uuid4().hex.upper()[:26],
+            'linkWebsiteHost': website_host,
+            'linkWebsiteName': self.websites.get(website_host, {}).get('name', ''),
+            'linkRelativeReference': relative_reference,
+            'releasedAt': released_at
+        }
+
+    # Language
+
+    def listLanguage(self, path, query, data):
+        return self.page([self.spec.model('Language', v) for v in self.languages.values()], query)
+
+    def addLanguage(self, path, query, data):
+        language = self.add(self.languages, data['lang'], {'lang': data['lang'], 'name': data['name']})
+
+        return 201, {}, self.spec.model('Language', language)
+
+    # Website
+
+    def getWebsite(self, path, query, data):
+        website = self.get(self.websites, path['host'])
+
+        return 200, {}, self.website(website)
+
+    def addWebsite(self, path, query, data):
+        website = self.add(self.websites, data['host'], {'host': data['host'], 'name': data['name'], 'languages': {}})
+
+        return 201, {}, self.website(website)
+
+    def website(self, website: dict):
+        return self.spec.model('Website', {
+            'host': website['host'],
+            'name': website['name'],
+            'itemLanguageCount': len(website['languages'])
+        })
+
+    def listWebsiteItemLanguage(self, path, query, data):
+        website = self.get(self.websites, path['websiteHost'])
+
+        return self.page([
+            self.spec.model('WebsiteItemLanguage', {'languageLang': k, 'machineTranslate': v})
+            for k, v in website['languages'].items()
+        ], query)
+
+    def addWebsiteItemLanguage(self, path, query, data):
+        website = self.get(self.websites, path['websiteHost'])
+        self.add(website['languages'], data['languageLang'], data.get('machineTranslate'))
+
+        return 201, {}, self.spec.model('WebsiteItemLanguage', data)
+
+    # Link
+
+    def listLink(self, path, query, data):
+        website_hosts = query.get('websiteHost')
+        relative_references = query.get('relativeReference')
+        hrefs = query.get('href')
+
+        links = []
+        for href, link in self.links.items():
+            if website_hosts and link['websiteHost'] not in website_hosts:
+                continue
+            if relative_references and link['relativeReference'] not in relative_references:
+                continue
+            if hrefs and href not in hrefs:
+                continue
+
+            links.append(self.spec.model('Link', self.link(link['websiteHost'], link['relativeReference'])))
+
+        return self.page(links, query)
+
+    def getLink(self, path, query, data):
+        link = self.get(self.links, path['href'])
+
+        return 200, {}, self.spec.model('Link', self.link(link['websiteHost'], link['relativeReference']))
+
+    def addLink(self, path, query, data):
+        self.get(self.websites, data['websiteHost'])
+
+        href = f'{data["websiteHost"]}{data.get("relativeReference") or ""}'
+        link = self.add(self.links, href, {
+            'websiteHost': data['websiteHost'],
+            'relativeReference': data.get('relativeReference'),
+            'languages': {}
+        })
+
+        return 201, {}, self.spec.model('Link', self.link(link['websiteHost'], link['relativeReference']))
+
+    def getLinkItemLanguage(self, path, query, data):
+        link = self.get(self.links, path['linkHref'])
+        self.get(link['languages'], path['lang'])
+
+        return 200, {}, self.spec.model('LinkItemLanguage', {
+            'languageLang': path['lang'],
+            'machineTranslate': link['languages'][path['lang']]
+        })
+
+    def addLinkItemLanguage(self, path, query, data):
+        link = self.get(self.links, path['linkHref'])
+        self.add(link['languages'], data['languageLang'], data.get('machineTranslate'))
+
+        return 201, {}, self.spec.model('LinkItemLanguage', data)
+
+    # Comic
+
+    def listComic(self, path, query, data):
+        hrefs = [
+            v.removeprefix('linkHREF=') for v in query.get('destinationLink', [])
+            if v.startswith('linkHREF=')
+        ]
+
+        comics = []
+        for code, comic in self.comics.items():
+            if hrefs and not any(v in comic['links'] for v in hrefs):
+                continue
+
+            comics.append(self.comic(code, comic))
+
+        return self.page(comics, query)
+
+    def getComic(self, path, query, data):
+        comic = self.get(self.comics, path['code'])
+
+        return 200, {}, self.comic(path['code'], comic)
+
+    def addComic(self, path, query, data):
+        comic = self.add(self.comics, data['code'], {'links': {}, 'chapters': {}})
+
+        return 201, {}, self.comic(data['code'], comic)
+
+    def comic(self, code: str, comic: dict):
+        return self.spec.model('Comic', {
+            'code': code,
+            'destinationLinkCount': len(comic['links']),
+            'chapterCount': len(comic['chapters'])
+        })
+
+    def listComicDestinationLink(self, path, query, data):
+        comic = self.get(self.comics, path['comicCode'])
+        hrefs = query.get('linkHREF')
+
+        return self.page([
+            self.spec.model('ComicDestinationLink', v) for k, v in comic['links'].items()
+            if not hrefs or k in hrefs
+        ], query)
+
+    def addComicDestinationLink(self, path, query, data):
+        comic = self.get(self.comics, path['comicCode'])
+
+        href = f'{data["linkWebsiteHost"]}{data.get("linkRelativeReference") or ""}'
+        self.get(self.links, href)
+        link = self.add(comic['links'], href, self.destination_link(
+            data['linkWebsiteHost'],
+            data.get('linkRelativeReference'),
+            data.get('releasedAt')
+        ))
+
+        return 201, {}, self.spec.model('ComicDestinationLink', link)
+
+    # Comic Chapter
+
+    def listComicChapter(self, path, query, data):
+        comic = self.get(self.comics, path['comicCode'])
+
+        return self.page([self.chapter(v) for v in comic['chapters'].values()], query)
+
+    def addComicChapter(self, path, query, data):
+        comic = self.get(self.comics, path['comicCode'])
+
+        nv = f'{number_of(data["number"])}{data.get("version") or ""}'
+        chapter = self.add(comic['chapters'], nv, {
+            'number': data['number'],
+            'version': data.get('version'),
+            'links': {}
+        })
+
+        return 201, {}, self.chapter(chapter)
+
+    def chapter(self, chapter: dict):
+        return self.spec.model('ComicChapter', {
+            'number': chapter['number'],
+            'version': chapter['version'],
+            'destinationLinkCount': len(chapter['links'])
+        })
+
+    def listComicChapterDestinationLink(self, path, query, data):
+        comic = self.get(self.comics, path['comicCode'])
+        chapter = self.get(comic['chapters'], path['chapterNV'])
+        hrefs = query.get('linkHREF')
+
+        return self.page([
+            self.spec.model('ComicChapterDestinationLink', v) for k, v in chapter['links'].items()
+            if not hrefs or k in hrefs
+        ], query)
+
+    def addComicChapterDestinationLink(self, path, query, data):
+        comic = self.get(self.comics, path['comicCode'])
+        chapter = self.get(comic['chapters'], path['chapterNV'])
+
+        href = f'{data["linkWebsiteHost"]}{data.get("linkRelativeReference") or ""}'
+        self.get(self.links, href)
+        link = self.add(chapter['links'], href, self.destination_link(
+            data['linkWebsiteHost'],
+            data.get('linkRelativeReference'),
+            data.get('releasedAt')
+        ))
+
+        return 201, {}, self.spec.model('ComicChapterDestinationLink', link)
+
+#
+# MangaDex
+#
+
+class MangaDexStore:
+    page_limit_manga = 100
+    page_limit_chapter = 100
+    page_limit_feed = 500
+    collection_window = 10000
+
+    def __init__(
+        self,
+        spec: Spec,
+        manga_count: int,
+        chapter_count: int,
+        languages: list[str],
+        group_count: int = 1
+    ):
+        self.spec = spec
+
+        epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+        self.mangas: list[dict] = []
+        self.chapters: dict[str, list[dict]] = {}
+        for i in range(manga_count):
+            manga_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f'manga/{i}'))
+
+            chapters = []
+            for j in range(chapter_count):
+                language = languages[j % len(languages)]
+                for g in range(group_count):
+                    uploaded_at = epoch + timedelta(minutes=i * chapter_count + j, seconds=g)
+                    chapters.append({
+                        'id': str(uuid.uuid5(uuid.NAMESPACE_URL, f'manga/{i}/chapter/{j}' + (f'/group/{g}' if g else ''))),
+                        'type': 'chapter',
+                        'attributes': {
+                            'chapter': str(j // len(languages) + 1),
+                            'translatedLanguage': language,
+                            'pages': 20,
+                            'version': 1,
+                            'createdAt': time_of(uploaded_at),
+                            'updatedAt': time_of(uploaded_at),
+                            'publishAt': time_of(uploaded_at)
+                        },
+                        'relationships': [{'id': manga_id, 'type': 'manga'}]
+                    })
+            self.chapters[manga_id] = chapters
+
+            self.mangas.append({
+                'id': manga_id,
+                'type': 'manga',
+                'attributes': {
+                    'title': {'en': f'Manga {i}'},
+                    'links': {'mal': str(i + 1)},
+                    'originalLanguage': 'ja',
+                    'status': 'ongoing',
+                    'contentRating': 'safe',
+                    'availableTranslatedLanguages': list(languages),
+                    'version': 1,
+                    'createdAt': time_of(epoch + timedelta(minutes=i)),
+                    'updatedAt': time_of(epoch + timedelta(minutes=(i + 1) * chapter_count))
+                },
+                'relationships': []
+            })
+
+    def collection(self, items: list, query: dict[str, list[str]], limit_max: int):
+        limit = int(first_of(query, 'limit') or 10)
+        offset = int(first_of(query, 'offset') or 0)
+        if limit > limit_max or limit < 0:
+            raise Error(400, f'limit must be between 0 and {limit_max}')
+        if offset + limit > self.collection_window:
+            raise Error(400, f'offset + limit must be less than or equal to {self.collection_window}')
+
+        for k, v in reversed(query.items()):
+            if k.startswith('order['):
+                items = sorted(
+                    items,
+                    key=lambda x: order_of(x['attributes'].get(k[6:-1])),
+                    reverse=v[0] == 'desc'
+                )
+
+        since = first_of(query, 'updatedAtSince')
+        if since:
+            items = [v for v in items if v['attributes']['updatedAt'][:19] >= since]
+
+        since = first_of(query, 'createdAtSince')
+        if since:
+            items = [v for v in items if v['attributes']['createdAt'][:19] >= since]
+
+        return 200, {}, {
+            'result': 'ok',
+            'response': 'collection',
+            'data': items[offset:offset+limit],
+            'limit': limit,
+            'offset': offset,
+            'total': len(items)
+        }
+
+    def get_search_manga(self, path, query, data):
+        mangas = self.mangas
+        if query.get('ids[]'):
+            ids = set(query['ids[]'])
+            mangas = [v for v in mangas if v['id'] in ids]
+
+        return self.collection(mangas, query, self.page_limit_manga)
+
+    def get_manga_id_feed(self, path, query, data):
+        chapters = self.chapters.get(path['id'])
+        if chapters is None:
+            raise Error(404, f'Manga {path["id"]} not found')
+
+        if query.get('translatedLanguage[]'):
+            languages = set(query['translatedLanguage[]'])
+            chapters = [v for v in chapters if v['attributes']['translatedLanguage'] in languages]
+
+        return self.collection(chapters, query, self.page_limit_feed)
+
+    def get_chapter(self, path, query, data):
+        chapters = [v for k in self.chapters.values() for v in k]
+
+        if query.get('translatedLanguage[]'):
+            languages = set(query['translatedLanguage[]'])
+            chapters = [v for v in chapters if v['attributes']['translatedLanguage'] in languages]
+
+        return self.collection(chapters, query, self.page_limit_chapter)
+
+def seed(comicbagi: ComicBagiStore, mangadex: MangaDexStore, existing: float, code_of):
+    for k, v in {'en': 'English', 'id': 'Indonesian', 'ja': 'Japanese', 'ko': 'Korean', 'zh': 'Chinese'}.items():
+        comicbagi.languages[k] = {'lang': k, 'name': v}
+
+    comicbagi.websites['mangadex.org'] = {
+        'host': 'mangadex.org',
+        'name': 'MangaDex',
+        'languages': {'en': 0, 'id': 0}
+    }
+
+    for manga in mangadex.mangas[:int(len(mangadex.mangas) * existing)]:
+        comic = {'links': {}, 'chapters': {}}
+        comicbagi.comics[code_of(int(manga['attributes']['links']['mal']))] = comic
+
+        href = f'mangadex.org/title/{manga["id"]}'
+        comicbagi.links[href] = {
+            'websiteHost': 'mangadex.org',
+            'relativeReference': f'/title/{manga["id"]}',
+            'languages': {k: 0 for k in manga['attributes']['availableTranslatedLanguages']}
+        }
+        comic['links'][href] = comicbagi.destination_link('mangadex.org', f'/title/{manga["id"]}', None)
+
+        for chapter in mangadex.chapters[manga['id']]:
+            attributes = chapter['attributes']
+            nv = str(number_of(attributes['chapter']))
+            comic_chapter = comic['chapters'].setdefault(nv, {
+                'number': number_of(attributes['chapter']),
+                'version': None,
+                'links': {}
+            })
+
+            href = f'mangadex.org/chapter/{chapter["id"]}'
+            comicbagi.links[href] = {
+                'websiteHost': 'mangadex.org',
+                'relativeReference': f'/chapter/{chapter["id"]}',
+                'languages': {attributes['translatedLanguage']: 0}
+            }
+            comic_chapter['links'][href] = comicbagi.destination_link('mangadex.org', f'/chapter/{chapter["id"]}', None)
+
+def order_of(value):
+    try:
+        return (0, float(value), '')
+    except (TypeError, ValueError):
+        return (1, 0.0, str(value))
+
+def first_of(query: dict[str, list[str]], key: str):
+    values = query.get(key)
+
+    return values[0] if values else None
+
+def number_of(value: float | int | str):
+    number = float(value)
+    if number.is_integer():
+        return int(number)
+
+    return number
+
+def time_of(value: datetime):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+def now_of():
+    return time_of(datetime.now(timezone.utc))
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+import multiprocessing
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from mock import Spec, MockServer, ComicBagiStore, MangaDexStore, seed
+
+api_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+
+unlimited_rate = (1e9, 1e9)
+
+class ComicKingJikan:
+    def get_or_add_comic_complete(self, mal_id: int):
+        return code_of(mal_id)
+
+def code_of(mal_id: int):
+    return f'B{mal_id:06d}'
+
+def serve(args: argparse.Namespace, queue):
+    comicbagi_spec = Spec(os.path.join(api_directory, 'openapi-comicbagi.yaml'))
+    mangadex_spec = Spec(os.path.join(api_directory, 'openapi-mangadex.yaml'))
+
+    comicbagi = ComicBagiStore(comicbagi_spec)
+    mangadex = MangaDexStore(mangadex_spec, args.manga, args.chapters, args.languages.split(','), args.groups)
+    if args.existing > 0:
+        seed(comicbagi, mangadex, args.existing, code_of)
+
+    servers = [MockServer(comicbagi_spec, comicbagi), MockServer(mangadex_spec, mangadex)]
+    servers[0].extra[('POST', '/oauth/token')] = comicbagi.oauth_token
+
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    queue.put([server.server_address[1] for server in servers])
+
+    threading.Event().wait()
+
+def stats_of(port: int):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stats') as response:
+        return json.load(response)
+
+def diff_of(before: dict, after: dict):
+    result = {}
+    for k, v in after.items():
+        result[k] = {x: y - before.get(k, {}).get(x, 0) for x, y in v.items()}
+
+    return {k: v for k, v in result.items() if v['count']}
+
+def run(args: argparse.Namespace, ports: list[int], catalog_path: str | None):
+    import mangadex_openapi
+    from comicbagi_scrap.bot import Bot
+    from comicbagi_scrap.bot_mangadex import BotMangaDex
+    from comicbagi_scrap.catalog import Catalog
+    from comicbagi_scrap.ratelimit import RateLimiter
+
+    logger = logging.getLogger('comicbagi_scrap')
+
+    comicbagi_url = f'http://127.0.0.1:{ports[0]}/api'
+    mangadex_url = f'http://127.0.0.1:{ports[1]}'
+    oauth_issuer = f'http://127.0.0.1:{ports[0]}/'
+
+    mangadex_openapi.Configuration.set_default(mangadex_openapi.Configuration(host=mangadex_url))
+
+    # The bots only configure hosts missing from the rates, so every upstream is listed to lift its limit
+    unlimited_rates = {v: unlimited_rate for v in (comicbagi_url, oauth_issuer, mangadex_url, BotMangaDex.rate_jikan_key)}
+    rate_limiter = RateLimiter() if args.rate_limit else RateLimiter(unlimited_rates, unlimited_rate)
+    catalog = Catalog(catalog_path) if catalog_path else None
+
+    before = [stats_of(v) for v in ports]
+    started = time.perf_counter()
+
+    bot = Bot(
+        comicbagi_url,
+        oauth_issuer=oauth_issuer,
+        oauth_client_id='benchmark',
+        oauth_client_secret='benchmark',
+        oauth_audience='benchmark',
+        logger=logger,
+        rate_limiter=rate_limiter,
+        catalog=catalog
+    )
+    bot.load(True)
+
+    bot_mangadex = BotMangaDex(
+        bot,
+        comicking_jikan_bot=ComicKingJikan(),
+        logger=logger,
+        write_concurrency=args.write_concurrency
+    )
+
+    if args.concurrency > 1:
+        asyncio.run(bot_mangadex.process_async(
+            args.max_comic,
+            args.max_chapter,
+            incremental=args.incremental,
+            concurrency=args.concurrency
+        ))
+    else:
+        bot_mangadex.process(
+            args.max_comic,
+            args.max_chapter,
+            incremental=args.incremental
+        )
+
+    wall = time.perf_counter() - started
+    after = [stats_of(v) for v in ports]
+
+    bot.transport.clear()
+    if catalog: catalog.close()
+
+    comicbagi = diff_of(before[0], after[0])
+    mangadex = diff_of(before[1], after[1])
+
+    requests = sum(v['count'] for v in comicbagi.values()) + sum(v['count'] for v in mangadex.values())
+    chapters = mangadex.get('get-manga-id-feed', {}).get('items', 0)
+
+    return {
+        'wall_seconds': wall,
+        'requests': requests,
+        'requests_comicbagi': sum(v['count'] for v in comicbagi.values()),
+        'requests_mangadex': sum(v['count'] for v in mangadex.values()),
+        'chapters': chapters,
+        'requests_per_chapter': requests / chapters if chapters else None,
+        'bytes_sent': sum(v['bytes_in'] for v in [*comicbagi.values(), *mangadex.values()]),
+        'bytes_received': sum(v['bytes_out'] for v in [*comicbagi.values(), *mangadex.values()]),
+        'rate_limit_wait_seconds': rate_limiter.waited,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'operations': {**comicbagi, **mangadex}
+    }
+
+def report(number: int, result: dict, verbose: bool):
+    per_chapter = 'n/a'
+    if result['requests_per_chapter'] is not None:
+        per_chapter = f'{result["requests_per_chapter"]:.2f}'
+
+    print(
+        f'run {number}: '
+        f'{result["wall_seconds"]:.2f} s, '
+        f'{result["requests"]} requests '
+        f'({result["requests_comicbagi"]} ComicBagi, {result["requests_mangadex"]} MangaDex), '
+        f'{result["chapters"]} chapters, '
+        f'{per_chapter} requests/chapter, '
+        f'{result["bytes_sent"] / 1024:.0f} KiB sent, '
+        f'{result["bytes_received"] / 1024:.0f} KiB received, '
+        f'{result["rate_limit_wait_seconds"]:.2f} s rate limited, '
+        f'peak RSS {result["peak_rss_mb"]:.1f} MiB'
+    )
+
+    if verbose:
+        for k, v in sorted(result['operations'].items(), key=lambda x: -x[1]['count']):
+            print(f'  {k}: {v["count"]} requests, {v["seconds"] * 1000:.0f} ms server time')
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the bot against local ComicBagi and MangaDex stand-ins.')
+    parser.add_argument('--manga', type=int, default=50, help='number of synthetic MangaDex manga')
+    parser.add_argument('--chapters', type=int, default=20, help='number of chapters per manga')
+    parser.add_argument('--languages', default='en,id', help='comma separated chapter languages')
+    parser.add_argument('--groups', type=int, default=1, help='scanlation groups uploading each chapter')
+    parser.add_argument('--existing', type=float, default=0, help='fraction of manga already in ComicBagi')
+    parser.add_argument('--runs', type=int, default=1, help='number of consecutive runs against the same servers')
+    parser.add_argument('--max-comic', type=int, help='max new comic per run')
+    parser.add_argument('--max-chapter', type=int, help='max new comic chapter per manga')
+    parser.add_argument('--concurrency', type=int, default=1, help='use process_async when greater than 1')
+    parser.add_argument('--write-concurrency', type=int, default=4, help='ComicBagi writes run at once per page')
+    parser.add_argument('--incremental', action='store_true', help='run incrementally, implies --catalog')
+    parser.add_argument('--catalog', action='store_true', help='use a fresh on-disk catalog shared across runs')
+    parser.add_argument('--rate-limit', action='store_true', help='keep the bot default rate limits')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--verbose', action='store_true', help='print per operation request counts')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(args, queue), daemon=True)
+    server.start()
+
+    results = []
+    try:
+        ports = queue.get(timeout=60)
+
+        with tempfile.TemporaryDirectory() as directory:
+            catalog_path = None
+            if args.catalog or args.incremental:
+                catalog_path = os.path.join(directory, 'bot.db')
+
+            for i in range(args.runs):
+                result = run(args, ports, catalog_path)
+                report(i + 1, result, args.verbose)
+                results.append(result)
+    finally:
+        server.terminate()
+        server.join()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'arguments': vars(args), 'runs': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,23 @@
-import os
-import dotenv
-import logging
-import comicking_scrap
+import importlib
 
-from .bot import Bot
-from .bot_mangadex import BotMangaDex
+__all__ = ['Bot', 'BotMangaDex', 'main']
 
-logging.basicConfig(level=logging.DEBUG)
+__lazy = {
+    'Bot': '.bot',
+    'BotMangaDex': '.bot_mangadex',
+    'Catalog': '.catalog',
+    'RateLimiter': '.ratelimit',
+    'TokenCache': '.oauth',
+    'Transport': '.transport'
+}
 
-def main():
-    dotenv.load_dotenv()
+def __getattr__(name: str):
+    if name in __lazy:
+        return getattr(importlib.import_module(__lazy[name], __name__), name)
 
-    logger = logging.getLogger(__name__)
-    note_file = open('bot.txt', 'a', encoding='utf-8')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-    bot = Bot(
-        os.getenv('COMICBAGI_SCRAP_BASE_COMICBAGI') or '',
-        oauth_issuer=os.getenv('COMICBAGI_SCRAP_OAUTH_ISSUER') or '',
-        oauth_client_id=os.getenv('COMICBAGI_SCRAP_OAUTH_CLIENT_ID') or '',
-        oauth_client_secret=os.getenv('COMICBAGI_SCRAP_OAUTH_CLIENT_SECRET') or '',
-        oauth_audience=os.getenv('COMICBAGI_SCRAP_OAUTH_AUDIENCE') or '',
-        logger=logger,
-        note_file=note_file
-    )
-    bot.load(True)
+def main(argv: list[str] | None = None):
+    from .cli import main
 
-    bot_comicking = comicking_scrap.Bot(
-        os.getenv('COMICBAGI_SCRAP_BASE_COMICKING') or '',
-        oauth_issuer=os.getenv('COMICBAGI_SCRAP_OAUTH_ISSUER') or '',
-        oauth_client_id=os.getenv('COMICBAGI_SCRAP_OAUTH_CLIENT_ID') or '',
-        oauth_client_secret=os.getenv('COMICBAGI_SCRAP_OAUTH_CLIENT_SECRET') or '',
-        oauth_audience=os.getenv('COMICBAGI_SCRAP_OAUTH_AUDIENCE') or '',
-        logger=logger,
-        note_file=note_file
-    )
-    bot_comicking.load(True)
-
-    bot_comicking_jikan = comicking_scrap.BotJikan(
-        bot_comicking,
-        logger=logger
-    )
-    bot_comicking_jikan.load(True)
-
-    bot_mangadex = BotMangaDex(
-        bot,
-        comicking_jikan_bot=bot_comicking_jikan,
-        logger=logger
-    )
-    bot_mangadex.process(
-        int(os.getenv('COMICBAGI_SCRAP_MAX_NEW_COMIC') or 1),
-        int(os.getenv('COMICBAGI_SCRAP_MAX_NEW_COMIC_CHAPTER') or 10)
-    )
-
-    note_file.close()
+    main(argv)
@@ -1,10 +1,24 @@
 import time
-import requests
+import threading
 import logging
 import comicbagi_openapi
 from datetime import datetime
 from io import TextIOWrapper
-from typing import Iterable
+from typing import Any, Iterable
+from urllib.parse import unquote
+
+from .catalog import Catalog
+from .journal import Journal
+from .metrics import Metrics
+from .oauth import TokenCache
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .snapshot import Snapshot
+from .stream import paginate
+from .transport import Transport, json_of
+
+class AuthenticationError(RuntimeError):
+    pass
 
 class Bot:
     language_english_lang = 'en'
@@ -13,6 +27,20 @@ class Bot:
     language_korean_lang = 'ko'
     language_chinese_lang = 'zh'
 
+    comic_chapter_page_limit = 100
+
+    list_page_limit = 100
+    list_concurrency = 4
+
+    rate_comicbagi = (2.0, 4.0)
+    rate_oauth = (1.0, 1.0)
+
+    oauth_expiry_margin = 300
+    oauth_refresh_margin = 600
+    oauth_refresh_retry = 10
+
+    snapshot_languages = 'languages'
+
     def __init__(
         self,
         base_comicbagi: str,
@@ -21,22 +49,56 @@ class Bot:
         oauth_client_secret: str,
         oauth_audience: str,
         logger: logging.Logger,
-        note_file: TextIOWrapper | None = None
+        note_file: TextIOWrapper | None = None,
+        rate_limiter: RateLimiter | None = None,
+        catalog: Catalog | None = None,
+        transport: Transport | None = None,
+        token_cache: TokenCache | None = None,
+        metrics: Metrics | None = None,
+        journal: Journal | None = None,
+        snapshot: Snapshot | None = None,
+        retry_policy: RetryPolicy | None = None
     ):
+        self.metrics = metrics or Metrics()
+        self.transport = transport or Transport(logger=logger)
+        self.retry_policy = retry_policy or RetryPolicy(logger=logger)
+
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.rate_limiter.configure(base_comicbagi, *self.rate_comicbagi)
+        self.rate_limiter.configure(oauth_issuer, *self.rate_oauth)
+
         self.client = comicbagi_openapi.ApiClient(configuration=comicbagi_openapi.Configuration(host=base_comicbagi))
+        self.metrics.attach(self.client, 'comicbagi')
+        self.transport.attach(self.client)
+        self.rate_limiter.attach(self.client)
+        self.retry_policy.attach(self.client)
 
         self.oauth_issuer = oauth_issuer
         self.oauth_client_id = oauth_client_id
         self.oauth_client_secret = oauth_client_secret
         self.oauth_audience = oauth_audience
         self.oauth_token_expires = time.time()
+        self.oauth_lock = threading.Lock()
+        self.oauth_token_cache = token_cache
+        self.oauth_refresher: threading.Thread | None = None
+        self.oauth_refresher_stop = threading.Event()
 
         self.languages: list[str] = []
         self.websites: list[str] = []
-        self.comic_chapters: list[str] = []
+        self.comic_chapters: set[str] = set()
+        self.comic_chapter_destination_links: set[str] = set()
+        self.comic_chapter_destination_link_counts: dict[str, int] = {}
+        self.comic_chapters_loaded: set[str] = set()
+        self.comic_chapter_destination_links_loaded: set[str] = set()
+        self.comic_chapters_lock = threading.Lock()
+
+        self.catalog = catalog
+        self.snapshot = snapshot
 
         self.logger = logger
         self.note_file = note_file
+        self.note_lock = threading.Lock()
+        self.journal = journal
 
     def load(self, seeding: bool = True):
         if seeding:
@@ -48,30 +110,18 @@ class Bot:
 
         api0 = comicbagi_openapi.LanguageApi(self.client)
 
-        language_page = 1
-        while True:
-            response = api0.list_language_with_http_info(page=language_page, limit=15)
+        languages_snapshot = self.snapshot.get(self.snapshot_languages) if self.snapshot else None
+        if languages_snapshot is not None:
+            self.languages.extend(languages_snapshot)
 
-            if not response.data:
-                break
-
-            for language in response.data:
+        if languages_snapshot is None:
+            for language in paginate(
+                api0.list_language_with_http_info,
+                limit=self.list_page_limit,
+                concurrency=self.list_concurrency
+            ):
                 self.languages.append(language.lang)
 
-            language_total_count = 0
-
-            if response.headers:
-                for k, v in response.headers.items():
-                    if k.lower() == 'x-total-count':
-                        language_total_count = int(v)
-                        break
-
-            if len(self.languages) >= language_total_count:
-                break
-
-            time.sleep(1)
-            language_page += 1
-
         if seeding:
             languages = {
                 self.language_english_lang: 'English',
@@ -84,43 +134,198 @@ class Bot:
                 if k in self.languages:
                     continue
 
-                result = self.add_language(k, v)
-                if not result:
-                    continue
+                # Shard workers seed at once, a conflict means another one added it first
+
+                try:
+                    self.add_language(k, v)
+                except comicbagi_openapi.ApiException as e:
+                    if e.status == 409:
+                        self.languages.append(k)
+                    else:
+                        raise e
+
+        if self.snapshot and languages_snapshot != self.languages:
+            self.snapshot.put(self.snapshot_languages, self.languages)
 
-                time.sleep(2)
+    def load_comic_chapters(self, comic_code: str):
+        with self.comic_chapters_lock:
+            if comic_code in self.comic_chapters_loaded:
+                return
+
+            api = comicbagi_openapi.ComicChapterApi(self.client)
+
+            for chapter in paginate(
+                api.list_comic_chapter_with_http_info,
+                comic_code,
+                limit=self.comic_chapter_page_limit,
+                concurrency=self.list_concurrency
+            ):
+                chapter_nv = f'{number_of(chapter.number)}{chapter.version or ""}'
+
+                self.comic_chapters.add(f'{comic_code} {chapter_nv}')
+                self.comic_chapter_destination_link_counts[f'{comic_code} {chapter_nv}'] = chapter.destination_link_count
+
+            self.comic_chapters_loaded.add(comic_code)
+
+    def load_comic_chapter_destination_links(self, comic_code: str, chapter_nv: str):
+        with self.comic_chapters_lock:
+            if f'{comic_code} {chapter_nv}' in self.comic_chapter_destination_links_loaded:
+                return
+
+            api = comicbagi_openapi.ComicChapterApi(self.client)
+
+            for link in paginate(
+                api.list_comic_chapter_destination_link_with_http_info,
+                comic_code,
+                chapter_nv,
+                limit=self.comic_chapter_page_limit,
+                concurrency=self.list_concurrency
+            ):
+                self.comic_chapter_destination_links.add(
+                    f'{comic_code} {chapter_nv} {link.link_website_host}{link.link_relative_reference or ""}'
+                )
+
+            self.comic_chapter_destination_links_loaded.add(f'{comic_code} {chapter_nv}')
 
     def authenticate(self):
-        if self.oauth_token_expires > time.time() + 300:
+        if self.oauth_token_expires > time.time() + self.oauth_expiry_margin:
+            return
+
+        with self.oauth_lock:
+            if self.oauth_token_expires > time.time() + self.oauth_expiry_margin:
+                return
+
+            if self.oauth_token_cache:
+                token = self.oauth_token_cache.get(self.oauth_issuer, self.oauth_client_id, self.oauth_audience)
+                if token and float(token['expires_at']) > time.time() + self.oauth_expiry_margin:
+                    self.client.configuration.access_token = token['access_token']
+                    self.oauth_token_expires = float(token['expires_at'])
+
+                    self.logger.info('ComicBagi Bot authenticated from token cache')
+
+                    return
+
+            self.__authenticate()
+
+    def start_refresh(self):
+        if self.oauth_refresher:
             return
 
-        response = requests.post(
+        def refresh():
+            delay = 0
+            try:
+                self.authenticate()
+
+                delay = max(self.oauth_token_expires - time.time() - self.oauth_refresh_margin, 0)
+            except Exception as e:
+                self.logger.warning('ComicBagi Bot token refresh failed: %s', e)
+
+            while not self.oauth_refresher_stop.wait(delay):
+                try:
+                    with self.oauth_lock:
+                        self.__authenticate()
+
+                    delay = max(
+                        self.oauth_token_expires - time.time() - self.oauth_refresh_margin,
+                        self.oauth_refresh_retry
+                    )
+                except Exception as e:
+                    self.logger.warning('ComicBagi Bot token refresh failed: %s', e)
+
+                    delay = self.oauth_refresh_retry
+
+        self.oauth_refresher_stop.clear()
+        self.oauth_refresher = threading.Thread(target=refresh, name='comicbagi-oauth-refresh', daemon=True)
+        self.oauth_refresher.start()
+
+    def stop_refresh(self):
+        if not self.oauth_refresher:
+            return
+
+        self.oauth_refresher_stop.set()
+        self.oauth_refresher.join()
+        self.oauth_refresher = None
+
+    def __authenticate(self):
+        def request():
+            self.rate_limiter.acquire(self.oauth_issuer)
+
+            start = time.perf_counter()
+            try:
+                response = self.transport.request(
+                    'POST',
+                    f'{self.oauth_issuer}oauth/token',
+                    fields={
+                        'grant_type': 'client_credentials',
+                        'client_id': self.oauth_client_id,
+                        'client_secret': self.oauth_client_secret,
+                        'audience': self.oauth_audience
+                    }
+                )
+            except Exception:
+                self.metrics.observe('oauth', 'POST /oauth/token', time.perf_counter() - start, True)
+                raise
+
+            self.metrics.observe('oauth', 'POST /oauth/token', time.perf_counter() - start, response.status >= 400)
+
+            self.rate_limiter.update(self.oauth_issuer, response.status, response.headers)
+
+            return response
+
+        response = self.retry_policy.run(
+            'POST',
             f'{self.oauth_issuer}oauth/token',
-            data={
-                'grant_type': 'client_credentials',
-                'client_id': self.oauth_client_id,
-                'client_secret': self.oauth_client_secret,
-                'audience': self.oauth_audience
-            }
+            request,
+            lambda response: response.headers
         )
 
-        if not response.ok:
-            raise RuntimeError('Bot authentication failed')
+        if response.status >= 400:
+            raise AuthenticationError('Bot authentication failed')
 
-        token = response.json()
+        token = json_of(response)
 
         config = self.client.configuration
         config.access_token = token['access_token']
         self.oauth_token_expires = time.time() + float(token['expires_in'])
 
+        if self.oauth_token_cache:
+            self.oauth_token_cache.put(
+                self.oauth_issuer,
+                self.oauth_client_id,
+                self.oauth_audience,
+                token['access_token'],
+                self.oauth_token_expires
+            )
+
         self.logger.info('ComicBagi Bot authenticated')
 
     def note(self, __lines: Iterable[str] | None = None):
         if __lines:
-            self.logger.info(__lines)
-            if self.note_file: self.note_file.writelines(__lines)
+            self.logger.debug(__lines)
+
+        if self.journal:
+            if __lines: self.journal.writelines(__lines)
+            return
+
+        with self.note_lock:
+            if __lines and self.note_file: self.note_file.writelines(__lines)
+            if self.note_file: self.note_file.writelines("\n")
 
-        if self.note_file: self.note_file.writelines("\n")
+    def event(self, event: str, message: str, level: int = logging.DEBUG, **fields: Any):
+        self.logger.log(level, message)
+
+        if self.journal:
+            self.journal.event(event, message=message, **fields)
+            return
+
+        with self.note_lock:
+            if self.note_file: self.note_file.writelines([message, "\n"])
+
+    def cached(self, kind: str, key: str):
+        return bool(self.catalog and self.catalog.has(kind, key))
+
+    def cache(self, kind: str, key: str, value: str = ''):
+        if self.catalog: self.catalog.put(kind, key, value)
 
     def add_language(
         self,
@@ -138,8 +343,9 @@ class Bot:
 
         if lang not in self.languages:
             self.languages.append(lang)
+        self.cache(Catalog.kind_language, lang)
 
-        self.logger.info('Language "%s" added', lang)
+        self.event('added', 'Language "%s" added' % lang, logging.INFO, kind=Catalog.kind_language, key=lang)
 
         return result
 
@@ -159,8 +365,9 @@ class Bot:
 
         if host not in self.websites:
             self.websites.append(host)
+        self.cache(Catalog.kind_website, host)
 
-        self.logger.info('Website "%s" added', host)
+        self.event('added', 'Website "%s" added' % host, logging.INFO, kind=Catalog.kind_website, key=host)
 
         return result
 
@@ -180,9 +387,14 @@ class Bot:
             )
         )
 
-        self.logger.info(
-            'Website "%s" Item Language "%s" added',
-            website_host, language_lang
+        self.cache(Catalog.kind_website_item_language, f'{website_host} {language_lang}')
+
+        self.event(
+            'added',
+            'Website "%s" Item Language "%s" added' % (website_host, language_lang),
+            logging.INFO,
+            kind=Catalog.kind_website_item_language,
+            key=f'{website_host} {language_lang}'
         )
 
         return result
@@ -201,7 +413,15 @@ class Bot:
             )
         )
 
-        self.logger.info('Link "%s" added', f'{website_host}{relative_reference}')
+        self.cache(Catalog.kind_link, f'{website_host}{relative_reference or ""}')
+
+        self.event(
+            'added',
+            'Link "%s" added' % f'{website_host}{relative_reference}',
+            logging.INFO,
+            kind=Catalog.kind_link,
+            key=f'{website_host}{relative_reference or ""}'
+        )
 
         return result
 
@@ -221,9 +441,14 @@ class Bot:
             )
         )
 
-        self.logger.info(
-            'Link "%s" Item Language "%s" added',
-            link_href, language_lang
+        self.cache(Catalog.kind_link_item_language, f'{unquote(link_href)} {language_lang}')
+
+        self.event(
+            'added',
+            'Link "%s" Item Language "%s" added' % (link_href, language_lang),
+            logging.INFO,
+            kind=Catalog.kind_link_item_language,
+            key=f'{unquote(link_href)} {language_lang}'
         )
 
         return result
@@ -240,7 +465,9 @@ class Bot:
             )
         )
 
-        self.logger.info('Comic "%s" added', code)
+        self.cache(Catalog.kind_comic, code)
+
+        self.event('added', 'Comic "%s" added' % code, logging.INFO, kind=Catalog.kind_comic, key=code)
 
         return result
 
@@ -262,9 +489,17 @@ class Bot:
             )
         )
 
-        self.logger.info(
-            'Comic "%s" Destination Link "%s" added',
-            comic_code, f'{link_website_host}{link_relative_reference}'
+        self.cache(
+            Catalog.kind_comic_destination_link,
+            f'{comic_code} {link_website_host}{link_relative_reference or ""}'
+        )
+
+        self.event(
+            'added',
+            'Comic "%s" Destination Link "%s" added' % (comic_code, f'{link_website_host}{link_relative_reference}'),
+            logging.INFO,
+            kind=Catalog.kind_comic_destination_link,
+            key=f'{comic_code} {link_website_host}{link_relative_reference or ""}'
         )
 
         return result
@@ -285,12 +520,16 @@ class Bot:
             )
         )
 
-        if f'{comic_code} {number}{version or ""}' not in self.comic_chapters:
-            self.comic_chapters.append(f'{comic_code} {number}{version or ""}')
+        self.comic_chapters.add(f'{comic_code} {number}{version or ""}')
+        self.comic_chapter_destination_link_counts[f'{comic_code} {number}{version or ""}'] = 0
+        self.cache(Catalog.kind_comic_chapter, f'{comic_code} {number}{version or ""}')
 
-        self.logger.info(
-            'Comic "%s" Chapter "%s" added',
-            comic_code, f'{number}{"+" + version if version else ""}'
+        self.event(
+            'added',
+            'Comic "%s" Chapter "%s" added' % (comic_code, f'{number}{"+" + version if version else ""}'),
+            logging.INFO,
+            kind=Catalog.kind_comic_chapter,
+            key=f'{comic_code} {number}{version or ""}'
         )
 
         return result
@@ -315,9 +554,29 @@ class Bot:
             )
         )
 
-        self.logger.info(
-            'Comic "%s" Chapter "%s" Destination Link "%s" added',
-            comic_code, chapter_nv, f'{link_website_host}{link_relative_reference}'
+        self.comic_chapter_destination_links.add(
+            f'{comic_code} {chapter_nv} {link_website_host}{link_relative_reference or ""}'
+        )
+        self.cache(
+            Catalog.kind_comic_chapter_destination_link,
+            f'{comic_code} {chapter_nv} {link_website_host}{link_relative_reference or ""}'
+        )
+
+        self.event(
+            'added',
+            'Comic "%s" Chapter "%s" Destination Link "%s" added' % (
+                comic_code, chapter_nv, f'{link_website_host}{link_relative_reference}'
+            ),
+            logging.INFO,
+            kind=Catalog.kind_comic_chapter_destination_link,
+            key=f'{comic_code} {chapter_nv} {link_website_host}{link_relative_reference or ""}'
         )
 
         return result
+
+def number_of(value: float | int | str):
+    number = float(value)
+    if number.is_integer():
+        return int(number)
+
+    return number
@@ -1,32 +1,104 @@
+import math
 import time
+import heapq
+import zlib
+import asyncio
 import logging
+import threading
 import comicbagi_openapi
 import mangadex_openapi
 import comicking_scrap
-from datetime import datetime
-from typing import Iterable
-from urllib.parse import quote
-
-from .bot import Bot
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, TypeVar
+from urllib.parse import quote, urlencode
+
+from .bot import AuthenticationError, Bot, number_of
+from .catalog import Catalog
+from .checkpoint import Checkpoint
+from .records import Chapter, ChapterRecord, Manga, MangaRecord, chapter_of, manga_of
+from .retry import RetryPolicy
+from .scheduler import Budget, WriteGraph
+from .stream import keyset, paginate, prefetch
+from .transport import json_loads
+
+T = TypeVar('T')
 
 class BotMangaDex:
     website_mangadex_host = 'mangadex.org'
 
+    rate_mangadex = (5.0, 5.0)
+    rate_jikan = (1 / 3, 1.0)
+    rate_jikan_key = 'api.jikan.moe'
+
+    link_batch_size = 25
+    manga_page_limit = 10
+    manga_scan_page_limit = 100
+    chapter_page_limit = 100
+    feed_page_limit = 500
+    manga_batch_size = 100
+    candidate_page_limit = 100
+
+    state_manga_updated_at = 'mangadex_manga_updated_at'
+    state_chapter_updated_at = 'mangadex_chapter_updated_at'
+    state_feed_updated_at = 'mangadex_feed_updated_at'
+
+    snapshot_websites = 'websites'
+    snapshot_item_languages = 'website_item_languages'
+
+    retry_errors = (comicbagi_openapi.ApiException, mangadex_openapi.ApiException, AuthenticationError, *RetryPolicy.errors)
+
     def __init__(
         self,
         bot: Bot,
         comicking_jikan_bot: comicking_scrap.BotJikan | None,
-        logger: logging.Logger
+        logger: logging.Logger,
+        write_concurrency: int = 4,
+        prefetch_pages: int = 2,
+        checkpoint: Checkpoint | None = None,
+        shard: int = 0,
+        shards: int = 1,
+        mal_comic_ttl: float = 30 * 24 * 60 * 60,
+        unmapped_ttl: float = 7 * 24 * 60 * 60,
+        budget: Budget | None = None,
+        candidates: int = 500,
+        full_scan: bool = False
     ):
         from mangadex_openapi.api_client import ApiClient as MangaDexApiClient
 
         self.bot = bot
         self.client = MangaDexApiClient()
+        self.bot.metrics.attach(self.client, 'mangadex')
+        self.bot.transport.attach(self.client)
+        self.bot.rate_limiter.configure(self.client.configuration.host, *self.rate_mangadex)
+        self.bot.rate_limiter.configure(self.rate_jikan_key, *self.rate_jikan)
+        self.bot.rate_limiter.attach(self.client)
+        self.bot.retry_policy.attach(self.client)
 
         self.comicking_jikan_bot = comicking_jikan_bot
 
         self.item_languages: list[str] = []
 
+        self.locks = [threading.Lock() for _ in range(64)]
+
+        self.write_concurrency = write_concurrency
+        self.prefetch_pages = prefetch_pages
+
+        self.checkpoint = checkpoint
+
+        self.shard = shard
+        self.shards = max(shards, 1)
+
+        self.mal_comic_ttl = mal_comic_ttl
+        self.unmapped_ttl = unmapped_ttl
+
+        self.retry_queue: list[Manga] = []
+
+        self.budget = budget
+        self.candidates = candidates
+
+        self.full_scan = full_scan
+
         self.logger = logger
 
     def load(self, seeding: bool = True):
@@ -39,46 +111,48 @@ class BotMangaDex:
 
         api0 = comicbagi_openapi.WebsiteApi(self.bot.client)
 
+        snapshot = self.bot.snapshot
+
+        websites_snapshot = snapshot.get(self.snapshot_websites) if snapshot else None
+        for website in websites_snapshot or []:
+            if website not in self.bot.websites:
+                self.bot.websites.append(website)
+
         if self.website_mangadex_host not in self.bot.websites:
             try:
                 api0.get_website(self.website_mangadex_host)
 
                 self.bot.websites.append(self.website_mangadex_host)
             except comicbagi_openapi.ApiException as e:
-                if seeding and e.status == 404:
-                    self.bot.add_website(self.website_mangadex_host, 'MangaDex')
-
-                    time.sleep(2)
-                else:
+                if not seeding or e.status != 404:
                     raise e
 
-        item_language_page = 1
-        while True:
-            response0 = api0.list_website_item_language_with_http_info(
-                self.website_mangadex_host,
-                page=item_language_page,
-                limit=15
-            )
+                # Shard workers seed at once, a conflict means another one added it first
 
-            if not response0.data:
-                break
+                try:
+                    self.bot.add_website(self.website_mangadex_host, 'MangaDex')
+                except comicbagi_openapi.ApiException as e:
+                    if e.status == 409:
+                        self.bot.websites.append(self.website_mangadex_host)
+                    else:
+                        raise e
 
-            for item_language in response0.data:
-                self.item_languages.append(item_language.language_lang)
+            if snapshot: snapshot.put(self.snapshot_websites, self.bot.websites)
 
-            item_language_total_count = 0
+        item_languages_key = f'{self.snapshot_item_languages} {self.website_mangadex_host}'
 
-            if response0.headers:
-                for k, v in response0.headers.items():
-                    if k.lower() == 'x-total-count':
-                        item_language_total_count = int(v)
-                        break
+        item_languages_snapshot = snapshot.get(item_languages_key) if snapshot else None
+        if item_languages_snapshot is not None:
+            self.item_languages.extend(item_languages_snapshot)
 
-            if len(self.item_languages) >= item_language_total_count:
-                break
-
-            time.sleep(1)
-            item_language_page += 1
+        if item_languages_snapshot is None:
+            for item_language in paginate(
+                api0.list_website_item_language_with_http_info,
+                self.website_mangadex_host,
+                limit=self.bot.list_page_limit,
+                concurrency=self.bot.list_concurrency
+            ):
+                self.item_languages.append(item_language.language_lang)
 
         if seeding:
             item_languages = {
@@ -89,43 +163,211 @@ class BotMangaDex:
                 if k in self.item_languages:
                     continue
 
-                self.bot.add_website_item_language(
-                    self.website_mangadex_host,
-                    k,
-                    v
-                )
+                try:
+                    self.bot.add_website_item_language(
+                        self.website_mangadex_host,
+                        k,
+                        v
+                    )
+                except comicbagi_openapi.ApiException as e:
+                    if e.status != 409:
+                        raise e
 
                 self.item_languages.append(k)
 
-                time.sleep(2)
+        if snapshot and item_languages_snapshot != self.item_languages:
+            snapshot.put(item_languages_key, self.item_languages)
 
     def note(self, __lines: Iterable[str] | None = None):
-        if __lines:
-            self.logger.info(__lines)
-            if self.bot.note_file: self.bot.note_file.writelines(__lines)
+        self.bot.note(__lines)
 
-        if self.bot.note_file: self.bot.note_file.writelines("\n")
+    def process(
+        self,
+        max_new_comic: int | None = None,
+        max_new_comic_chapter: int | None = None,
+        incremental: bool = False
+    ):
+        self.note('#')
+        self.note('# Started time %s' % time.ctime())
+        self.note('#')
+        self.note()
 
-    def process(self, max_new_comic: int | None = None, max_new_comic_chapter: int | None = None):
+        try:
+            self.load(True)
+
+            if self.budget:
+                self.scrap_comics_priority(max_new_comic, max_new_comic_chapter, incremental)
+            else:
+                self.scrap_comics_complete(max_new_comic, max_new_comic_chapter, incremental)
+            self.retry_deferred(max_new_comic_chapter, incremental)
+        except Exception as e:
+            self.bot.event('error', 'Stopped by %s: %s' % (type(e).__name__, e), logging.ERROR, type=type(e).__name__)
+            raise
+        finally:
+            self.bot.metrics.write(self.bot.rate_limiter.waited, self.bot.retry_policy.paused)
+
+        self.note()
+        self.note('# Stopped time %s' % time.ctime())
+        self.note()
+
+    async def process_async(
+        self,
+        max_new_comic: int | None = None,
+        max_new_comic_chapter: int | None = None,
+        incremental: bool = False,
+        concurrency: int = 4
+    ):
         self.note('#')
         self.note('# Started time %s' % time.ctime())
         self.note('#')
         self.note()
 
-        self.load(True)
+        try:
+            await asyncio.to_thread(self.load, True)
 
-        self.scrap_comics_complete(max_new_comic, max_new_comic_chapter)
+            if self.budget:
+                await self.scrap_comics_priority_async(max_new_comic, max_new_comic_chapter, incremental, concurrency)
+            else:
+                await self.scrap_comics_complete_async(max_new_comic, max_new_comic_chapter, incremental, concurrency)
+            await asyncio.to_thread(self.retry_deferred, max_new_comic_chapter, incremental)
+        except Exception as e:
+            self.bot.event('error', 'Stopped by %s: %s' % (type(e).__name__, e), logging.ERROR, type=type(e).__name__)
+            raise
+        finally:
+            self.bot.metrics.write(self.bot.rate_limiter.waited, self.bot.retry_policy.paused)
 
         self.note()
         self.note('# Stopped time %s' % time.ctime())
         self.note()
 
-    def __manga(self, manga: mangadex_openapi.Manga):
+    def iter_manga(
+        self,
+        since: str | None = None,
+        incremental: bool = False,
+        offset: int = 0,
+        cursor: tuple[str | None, list[str]] | None = None
+    ):
+        pages = self.__manga_pages(since, incremental, offset, cursor)
+        try:
+            for records in pages:
+                yield from records
+        finally:
+            pages.close()
+
+    def iter_manga_chapters(
+        self,
+        manga_id: str,
+        since: str | None = None,
+        incremental: bool = False,
+        offset: int = 0
+    ):
+        pages = self.__manga_chapter_pages(manga_id, since, incremental, offset)
+        try:
+            for records in pages:
+                yield from records
+        finally:
+            pages.close()
+
+    def __manga_pages(
+        self,
+        since: str | None,
+        incremental: bool = False,
+        offset: int = 0,
+        cursor: tuple[str | None, list[str]] | None = None
+    ):
+        if incremental or self.full_scan:
+            return self.__manga_scan_pages(since, incremental, cursor)
+
+        def fetch(page: int):
+            response = self.__manga_page(page)
+
+            return [
+                MangaRecord(v, (page-1)*self.manga_page_limit + i, None) for i, v in enumerate(response)
+                if v.id and (page-1)*self.manga_page_limit + i >= offset
+            ], len(response) < self.manga_page_limit
+
+        # Shards take every shards-th search page, starting from their own
+
+        start = offset // self.manga_page_limit + 1
+        start += (self.shard - (start - 1)) % self.shards
+
+        return prefetch(fetch, self.prefetch_pages, start, self.shards)
+
+    def __manga_scan_pages(
+        self,
+        since: str | None,
+        incremental: bool = False,
+        cursor: tuple[str | None, list[str]] | None = None
+    ):
+        key = 'updatedAt' if incremental else 'createdAt'
+
+        def key_of(manga: Manga):
+            value = getattr(manga.attributes, 'updated_at' if incremental else 'created_at', None)
+
+            return since_of(value) if value else None
+
+        scan = keyset(
+            lambda since, offset: self.__manga_scan_page(key, since, offset),
+            key_of,
+            lambda manga: manga.id,
+            self.manga_scan_page_limit,
+            cursor or (since, [])
+        )
+
+        def fetch(page: int):
+            mangas, last = scan()
+
+            # Shards take the manga whose ID hashes to them
+
+            return [
+                MangaRecord(v, None, k) for v, k in mangas
+                if self.shards < 2 or zlib.crc32(v.id.encode()) % self.shards == self.shard
+            ], last
+
+        return prefetch(fetch, self.prefetch_pages)
+
+    def __manga_chapter_pages(self, manga_id: str, since: str | None, incremental: bool = False, offset: int = 0):
+        seen: set[tuple[str, str]] = set()
+
+        def fetch(page: int):
+            chapters, links, last = self.__manga_feed_page(manga_id, page, since, incremental, seen)
+
+            return [
+                ChapterRecord(manga_id, v, links.get(f'/chapter/{v.id}'), page, i == len(chapters) - 1)
+                for i, v in enumerate(chapters)
+            ], last
+
+        return prefetch(fetch, self.prefetch_pages, offset // self.feed_page_limit + 1)
+
+    def __lock(self, key: str):
+        return self.locks[hash(key) % len(self.locks)]
+
+    def __manga(self, manga: Manga):
         comic_code, comic_exist = None, False
 
         if not manga.id:
             return comic_code, comic_exist
 
+        if self.bot.catalog:
+            comic_code = self.bot.catalog.get(Catalog.kind_mangadex_manga, manga.id)
+            if comic_code:
+                return comic_code, True
+
+            # Unmapped manga are checked again once updated on MangaDex or expired
+
+            unmapped = self.bot.catalog.get(Catalog.kind_mangadex_manga_unmapped, manga.id, self.unmapped_ttl)
+            if unmapped:
+                reason, _, updated_at = unmapped.partition(' ')
+                if updated_at == updated_of(manga):
+                    self.bot.event(
+                        'skipped',
+                        'MangaDex manga ID %s skipped as unmapped' % manga.id,
+                        manga_id=manga.id,
+                        reason=reason
+                    )
+
+                    return comic_code, comic_exist
+
         api0 = comicbagi_openapi.ComicApi(self.bot.client)
 
         response0 = api0.list_comic(
@@ -142,6 +384,8 @@ class BotMangaDex:
             manga_attributes = manga.attributes
 
             if not manga_attributes:
+                self.__unmapped(manga, 'no_attributes')
+
                 return comic_code, comic_exist
 
             if manga_attributes.links:
@@ -151,53 +395,80 @@ class BotMangaDex:
 
                     match k:
                         case 'mal':
+                            if self.bot.catalog:
+                                comic_code = self.bot.catalog.get(Catalog.kind_mal_comic, str(v), self.mal_comic_ttl)
+                                if comic_code:
+                                    continue
+
                             self.note('=== ComicKing Scrap ===')
 
                             if not self.comicking_jikan_bot:
                                 continue
 
+                            self.bot.rate_limiter.acquire(self.rate_jikan_key)
+
                             comic_code = self.comicking_jikan_bot.get_or_add_comic_complete(int(v))
 
-                            self.note('=== ComicKing Scrap ===')
+                            if comic_code:
+                                self.bot.cache(Catalog.kind_mal_comic, str(v), comic_code)
 
-                            time.sleep(3)
+                            self.note('=== ComicKing Scrap ===')
                         case _:
                             continue
 
             if not comic_code:
+                if not (manga_attributes.links or {}).get('mal'):
+                    self.__unmapped(manga, 'no_mal_link')
+                elif self.comicking_jikan_bot:
+                    self.__unmapped(manga, 'unresolved')
+
                 return comic_code, comic_exist
 
-            try:
-                api0.get_comic(comic_code)
-            except comicbagi_openapi.ApiException as e:
-                if e.status == 404:
-                    self.bot.add_comic(comic_code)
+            with self.__lock(comic_code):
+                if not self.bot.cached(Catalog.kind_comic, comic_code):
+                    try:
+                        api0.get_comic(comic_code)
 
-                    time.sleep(2)
-                else:
-                    raise e
+                        self.bot.cache(Catalog.kind_comic, comic_code)
+                    except comicbagi_openapi.ApiException as e:
+                        if e.status == 404:
+                            self.bot.add_comic(comic_code)
+                        else:
+                            raise e
 
             # Comic Destinaton Link
 
             comic_link = f'{self.website_mangadex_host}/title/{manga.id}'
 
-            try:
-                api1.get_link(comic_link)
-            except comicbagi_openapi.ApiException as e:
-                if e.status == 404:
-                    self.bot.add_link(self.website_mangadex_host, f'/title/{manga.id}')
+            if not self.bot.cached(Catalog.kind_link, comic_link):
+                try:
+                    api1.get_link(comic_link)
 
-                    time.sleep(2)
-                else:
-                    raise e
+                    self.bot.cache(Catalog.kind_link, comic_link)
+                except comicbagi_openapi.ApiException as e:
+                    if e.status == 404:
+                        self.bot.add_link(self.website_mangadex_host, f'/title/{manga.id}')
+                    else:
+                        raise e
 
             if manga_attributes.available_translated_languages:
                 for comic_link_item_language in manga_attributes.available_translated_languages:
                     if comic_link_item_language not in self.item_languages:
                         continue
 
+                    if self.bot.cached(
+                        Catalog.kind_link_item_language,
+                        f'{comic_link} {comic_link_item_language}'
+                    ):
+                        continue
+
                     try:
                         api1.get_link_item_language(comic_link, comic_link_item_language)
+
+                        self.bot.cache(
+                            Catalog.kind_link_item_language,
+                            f'{comic_link} {comic_link_item_language}'
+                        )
                     except comicbagi_openapi.ApiException as e:
                         if e.status == 404:
                             self.bot.add_link_item_language(
@@ -205,38 +476,139 @@ class BotMangaDex:
                                 comic_link_item_language,
                                 machine_translate=0
                             )
-
-                            time.sleep(2)
                         else:
                             raise e
 
-            response02 = api0.list_comic_destination_link(
-                comic_code,
-                link_href=[quote(comic_link)]
-            )
-            if len(response02) < 1:
-                comic_released_at = datetime.now()
-
-                if manga_attributes.created_at:
-                    comic_released_at = datetime.fromisoformat(manga_attributes.created_at)
-
-                self.bot.add_comic_destinaton_link(
+            if not self.bot.cached(Catalog.kind_comic_destination_link, f'{comic_code} {comic_link}'):
+                response02 = api0.list_comic_destination_link(
                     comic_code,
-                    self.website_mangadex_host,
-                    f'/title/{manga.id}',
-                    comic_released_at
+                    link_href=[quote(comic_link)]
                 )
+                if len(response02) < 1:
+                    comic_released_at = datetime.now()
+
+                    if manga_attributes.created_at:
+                        comic_released_at = datetime.fromisoformat(manga_attributes.created_at)
 
-                time.sleep(2)
+                    self.bot.add_comic_destinaton_link(
+                        comic_code,
+                        self.website_mangadex_host,
+                        f'/title/{manga.id}',
+                        comic_released_at
+                    )
+                else:
+                    self.bot.cache(Catalog.kind_comic_destination_link, f'{comic_code} {comic_link}')
         else:
             if len(response0) > 1:
                 self.note('Detected multiple comic with same MangaDex ID %s' % manga.id)
 
             comic_code, comic_exist = response0[0].code, True
 
+        self.bot.cache(Catalog.kind_mangadex_manga, manga.id, comic_code)
+
         return comic_code, comic_exist
 
-    def __manga_chapter(self, comic_code: str, chapter: mangadex_openapi.Chapter):
+    def __mapped(self, manga: Manga):
+        # Mapped once, the comic is not new even after the cached entry expired
+
+        return bool(
+            manga.id and self.bot.catalog and self.bot.catalog.get(Catalog.kind_mangadex_manga, manga.id, math.inf)
+        )
+
+    def __unmapped(self, manga: Manga, reason: str):
+        self.bot.event(
+            'unmapped',
+            'MangaDex manga ID %s cannot be mapped to a comic' % manga.id,
+            manga_id=manga.id,
+            reason=reason
+        )
+
+        self.bot.cache(Catalog.kind_mangadex_manga_unmapped, manga.id, f'{reason} {updated_of(manga)}')
+
+    def warm_mal_comics(self):
+        if not self.bot.catalog:
+            raise ValueError('Warming MAL comic codes requires a catalog')
+
+        api = comicbagi_openapi.ComicApi(self.bot.client)
+
+        total = 0
+
+        mangas: dict[str, str] = {}
+
+        def flush():
+            nonlocal total
+
+            if not mangas:
+                return
+
+            query = [('limit', str(len(mangas)))]
+            query.extend(('ids[]', v) for v in mangas)
+
+            for manga in self.__mangadex_get('/manga', query, manga_of):
+                comic_code = mangas.get(manga.id)
+                if not comic_code:
+                    continue
+
+                self.bot.cache(Catalog.kind_mangadex_manga, manga.id, comic_code)
+
+                mal_id = (manga.attributes.links or {}).get('mal') if manga.attributes else None
+                if mal_id:
+                    self.bot.cache(Catalog.kind_mal_comic, str(mal_id), comic_code)
+                    total += 1
+
+            mangas.clear()
+
+        for comic in paginate(
+            api.list_comic_with_http_info,
+            limit=self.bot.list_page_limit,
+            concurrency=self.bot.list_concurrency
+        ):
+            if not comic.destination_link_count:
+                continue
+
+            for link in api.list_comic_destination_link(
+                comic.code,
+                link_website_host=[self.website_mangadex_host]
+            ):
+                relative_reference = link.link_relative_reference or ''
+                if relative_reference.startswith('/title/'):
+                    mangas[relative_reference.removeprefix('/title/')] = comic.code
+
+                if len(mangas) >= self.manga_batch_size:
+                    flush()
+
+        flush()
+
+        self.bot.event('warmed', 'Warmed %s MAL comic codes' % total, logging.INFO, kind=Catalog.kind_mal_comic, count=total)
+
+        return total
+
+    def __links(self, relative_references: list[str]):
+        links: dict[str, comicbagi_openapi.Link] = {}
+
+        api0 = comicbagi_openapi.LinkApi(self.bot.client)
+
+        for i in range(0, len(relative_references), self.link_batch_size):
+            batch = relative_references[i:i+self.link_batch_size]
+
+            for link in paginate(
+                api0.list_link_with_http_info,
+                limit=len(batch),
+                concurrency=self.bot.list_concurrency,
+                website_host=[quote(self.website_mangadex_host)],
+                relative_reference=[quote(v) for v in batch]
+            ):
+                links[link.relative_reference or ''] = link
+
+        return links
+
+    def __manga_chapter(
+        self,
+        comic_code: str,
+        chapter: Chapter,
+        link: comicbagi_openapi.Link | None,
+        writes: WriteGraph
+    ):
         chapter_nv, chapter_exist = None, False
 
         chapter_attributes = chapter.attributes
@@ -244,34 +616,40 @@ class BotMangaDex:
         if not chapter.id or not chapter_attributes or not chapter_attributes.chapter:
             return chapter_nv, chapter_exist
 
-        api0 = comicbagi_openapi.ComicChapterApi(self.bot.client)
+        if self.bot.catalog:
+            chapter_nv = self.bot.catalog.get(Catalog.kind_mangadex_chapter, chapter.id)
+            if chapter_nv:
+                return chapter_nv, True
 
         # Chapter
 
-        chapter_number = float(chapter_attributes.chapter)
-        try:
-            chapter_number = int(chapter_attributes.chapter)
-        except ValueError:
-            pass
-
-        if f'{comic_code} {chapter_number}' not in self.bot.comic_chapters:
-            try:
-                api0.get_comic_chapter(comic_code, str(chapter_number))
+        chapter_number = number_of(chapter_attributes.chapter)
+        chapter_key = f'{comic_code} {chapter_number}'
+        chapter_write = None
 
-                self.bot.comic_chapters.append(f'{comic_code} {chapter_number}')
+        with self.__lock(chapter_key):
+            if chapter_key in self.bot.comic_chapters:
+                chapter_exist = True
+            elif self.bot.cached(Catalog.kind_comic_chapter, chapter_key):
+                self.bot.comic_chapters.add(chapter_key)
 
                 chapter_exist = True
-            except comicbagi_openapi.ApiException as e:
-                if e.status == 404:
-                    self.bot.add_comic_chapter(
-                        comic_code,
-                        chapter_number,
-                        None
-                    )
+            elif not writes.has(f'comic_chapter {chapter_key}'):
+                self.bot.load_comic_chapters(comic_code)
 
-                    time.sleep(2)
-                else:
-                    raise e
+                if chapter_key in self.bot.comic_chapters:
+                    self.bot.cache(Catalog.kind_comic_chapter, chapter_key)
+
+                    chapter_exist = True
+
+            if not chapter_exist:
+                chapter_write = writes.add(
+                    f'comic_chapter {chapter_key}',
+                    self.bot.add_comic_chapter,
+                    comic_code,
+                    chapter_number,
+                    None
+                )
 
         chapter_nv = str(chapter_number)
 
@@ -280,129 +658,796 @@ class BotMangaDex:
         if chapter_attributes.translated_language not in self.item_languages:
             return chapter_nv, chapter_exist
 
-        api1 = comicbagi_openapi.LinkApi(self.bot.client)
-
-        chapter_link = quote(f'{self.website_mangadex_host}/chapter/{chapter.id}')
+        chapter_link_key = f'{self.website_mangadex_host}/chapter/{chapter.id}'
+        chapter_link = quote(chapter_link_key)
+        link_write = None
 
-        try:
-            api1.get_link(chapter_link)
-        except comicbagi_openapi.ApiException as e:
-            if e.status == 404:
-                self.bot.add_link(self.website_mangadex_host, f'/chapter/{chapter.id}')
-
-                time.sleep(2)
-            else:
-                raise e
+        link_exist = bool(link) or self.bot.cached(Catalog.kind_link, chapter_link_key)
+        if not link_exist:
+            link_write = writes.add(
+                f'link {chapter_link_key}',
+                self.bot.add_link,
+                self.website_mangadex_host,
+                f'/chapter/{chapter.id}'
+            )
+        elif link:
+            self.bot.cache(Catalog.kind_link, chapter_link_key)
+
+        link_item_language_key = f'{chapter_link_key} {chapter_attributes.translated_language}'
+        link_item_language_write = None
+        if link and link.item_language_count > 0:
+            self.bot.cache(Catalog.kind_link_item_language, link_item_language_key)
+        elif not self.bot.cached(Catalog.kind_link_item_language, link_item_language_key):
+            link_item_language_write = writes.add(
+                f'link_item_language {link_item_language_key}',
+                self.bot.add_link_item_language,
+                chapter_link,
+                chapter_attributes.translated_language,
+                machine_translate=0,
+                after=[link_write]
+            )
 
-        try:
-            api1.get_link_item_language(chapter_link, chapter_attributes.translated_language)
-        except comicbagi_openapi.ApiException as e:
-            if e.status == 404:
-                self.bot.add_link_item_language(
-                    chapter_link,
-                    chapter_attributes.translated_language,
-                    machine_translate=0
-                )
+        chapter_destination_link_key = f'{comic_code} {chapter_nv} {chapter_link_key}'
+        chapter_destination_link_write = None
+        chapter_destination_link_exist = self.bot.cached(
+            Catalog.kind_comic_chapter_destination_link,
+            chapter_destination_link_key
+        )
+        if link_exist and chapter_exist and not chapter_destination_link_exist:
+            if self.bot.comic_chapter_destination_link_counts.get(chapter_key, 1) > 0:
+                self.bot.load_comic_chapter_destination_links(comic_code, chapter_nv)
 
-                time.sleep(2)
-            else:
-                raise e
+            if chapter_destination_link_key in self.bot.comic_chapter_destination_links:
+                self.bot.cache(Catalog.kind_comic_chapter_destination_link, chapter_destination_link_key)
 
-        response = api0.list_comic_chapter_destination_link(
-            comic_code,
-            chapter_nv,
-            link_href=[quote(chapter_link)]
-        )
-        if len(response) < 1:
+                chapter_destination_link_exist = True
+        if not chapter_destination_link_exist:
             chapter_released_at = datetime.now()
 
             if chapter_attributes.created_at:
                 chapter_released_at = datetime.fromisoformat(chapter_attributes.created_at)
 
-            self.bot.add_comic_chapter_destinaton_link(
+            chapter_destination_link_write = writes.add(
+                f'comic_chapter_destination_link {chapter_destination_link_key}',
+                self.bot.add_comic_chapter_destinaton_link,
                 comic_code,
                 chapter_nv,
                 self.website_mangadex_host,
                 f'/chapter/{chapter.id}',
-                released_at=chapter_released_at
+                released_at=chapter_released_at,
+                after=[chapter_write, link_write]
             )
 
-            time.sleep(2)
+        writes.add(
+            f'mangadex_chapter {chapter.id}',
+            self.bot.cache,
+            Catalog.kind_mangadex_chapter,
+            chapter.id,
+            chapter_nv,
+            after=[chapter_write, link_write, link_item_language_write, chapter_destination_link_write]
+        )
 
         return chapter_nv, chapter_exist
 
-    def scrap_comics_complete(self, max_comic: int | None = None, max_comic_chapter: int | None = None):
-        api1 = mangadex_openapi.MangaApi(self.client)
-        api2 = mangadex_openapi.MangaApi(self.client)
+    def __mangadex_get(self, path: str, query: list[tuple[str, str]], entity_of: Callable[[dict[str, Any]], T]):
+        # Only a few fields are read, so the generated models are skipped for slotted records
 
-        total_comic = 0
+        return [entity_of(v) for v in self.__mangadex_json(path, query).get('data') or []]
 
-        page = 1
-        while True:
-            if max_comic and total_comic > max_comic - 1:
-                break
+    def __mangadex_json(self, path: str, query: list[tuple[str, str]]) -> dict[str, Any]:
+        response = self.client.call_api(
+            'GET',
+            f'{self.client.configuration.host}{path}?{urlencode(query)}',
+            header_params={**self.client.default_headers, 'Accept': 'application/json'}
+        )
+        data = response.read()
+
+        if not 200 <= response.status <= 299:
+            raise mangadex_openapi.ApiException(http_resp=response)
+
+        return json_loads(data)
+
+    def __state(self, key: str, incremental: bool = False):
+        if not incremental or not self.bot.catalog:
+            return None
+
+        return self.bot.catalog.get_state(key)
+
+    def __checkpoint(self, key: str, entity: Manga | Chapter):
+        if not self.bot.catalog or not entity.attributes or not entity.attributes.updated_at:
+            return
+
+        self.bot.catalog.put_state(key, since_of(entity.attributes.updated_at))
+
+    def __resume(self, incremental: bool = False):
+        # Incremental runs resume from their updatedAt states instead
+
+        if not self.checkpoint or incremental:
+            return 0, None, None, 0
+
+        offset, cursor = 0, None
+        if self.full_scan:
+            cursor = self.checkpoint.get('manga_cursor')
+            if cursor:
+                cursor = (cursor[0], cursor[1])
+                self.note('Resume from MangaDex manga created at %s' % cursor[0])
+        else:
+            offset = self.checkpoint.get('manga_offset', 0)
+            if offset:
+                self.note('Resume from MangaDex manga offset %s' % offset)
+
+        return offset, cursor, self.checkpoint.get('manga_id'), self.checkpoint.get('feed_offset', 0)
+
+    def __save(self, incremental: bool = False, **values):
+        if not self.checkpoint or incremental:
+            return
+
+        self.checkpoint.update(**values)
+
+    def __save_manga(self, incremental: bool, record: MangaRecord):
+        if record.cursor is not None:
+            self.__save(incremental, manga_cursor=record.cursor, manga_id=None, feed_offset=0)
+        else:
+            self.__save(incremental, manga_offset=record.offset + 1, manga_id=None, feed_offset=0)
+
+    def __manga_page(self, page: int):
+        query = [('limit', str(self.manga_page_limit)), ('offset', str((page-1)*self.manga_page_limit))]
+
+        return self.__mangadex_get('/manga', query, manga_of)
+
+    def __manga_scan_page(self, key: str, since: str | None, offset: int = 0):
+        query = [('limit', str(self.manga_scan_page_limit)), ('offset', str(offset)), (f'order[{key}]', 'asc')]
+        if since:
+            query.append((f'{key}Since', since))
+
+        return self.__mangadex_get('/manga', query, manga_of)
 
-            response = api1.get_search_manga(
-                limit=10,
-                offset=(page-1)*10
+    def __manga_feed_page(
+        self,
+        manga_id: str,
+        page: int,
+        since: str | None,
+        incremental: bool = False,
+        seen: set[tuple[str, str]] | None = None
+    ):
+        query = [('limit', str(self.feed_page_limit)), ('offset', str((page-1)*self.feed_page_limit))]
+        query.extend(('translatedLanguage[]', v) for v in self.item_languages)
+        if incremental:
+            query.append(('order[updatedAt]', 'asc'))
+            if since:
+                query.append(('updatedAtSince', since))
+        else:
+            query.extend([('order[chapter]', 'asc'), ('order[createdAt]', 'asc')])
+
+        response = self.__mangadex_get(f'/manga/{manga_id}/feed', query, chapter_of)
+
+        # One chapter per number and language, other scanlation group uploads are duplicates
+
+        seen = seen if seen is not None else set()
+        chapters: list[Chapter] = []
+        for chapter in response:
+            if not chapter.id or not chapter.attributes or not chapter.attributes.chapter:
+                continue
+
+            chapter_key = (str(number_of(chapter.attributes.chapter)), chapter.attributes.translated_language)
+            if chapter_key in seen:
+                self.bot.event(
+                    'skipped',
+                    'MangaDex chapter ID %s skipped as duplicate' % chapter.id,
+                    manga_id=manga_id,
+                    chapter_id=chapter.id,
+                    reason='duplicate'
+                )
+
+                self.bot.cache(Catalog.kind_mangadex_chapter, chapter.id, chapter_key[0])
+
+                continue
+
+            seen.add(chapter_key)
+            chapters.append(chapter)
+
+        chapter_links = self.__links([
+            f'/chapter/{v.id}' for v in chapters
+            if v.attributes.translated_language in self.item_languages and
+            not self.bot.cached(
+                Catalog.kind_link_item_language,
+                f'{self.website_mangadex_host}/chapter/{v.id} {v.attributes.translated_language}'
             )
-            if not response.data:
+        ])
+
+        return chapters, chapter_links, len(response) < self.feed_page_limit
+
+    def __chapter_state(self, started: str):
+        since = self.__state(self.state_chapter_updated_at, True)
+
+        # Without a state the manga pass has just walked every feed, so chapters are followed from the run start
+
+        if not since and self.bot.catalog:
+            since = started
+            self.bot.catalog.put_state(self.state_chapter_updated_at, since)
+
+        return since
+
+    def __chapter_pages(self, since: str | None):
+        scan = keyset(
+            self.__chapter_page,
+            lambda chapter: updated_of(chapter) or None,
+            lambda chapter: chapter.id,
+            self.chapter_page_limit,
+            (since, [])
+        )
+
+        def fetch():
+            chapters, last = scan()
+
+            return [v for v, _ in chapters], last
+
+        return fetch
+
+    def __chapter_page(self, since: str | None, offset: int = 0):
+        query = [('limit', str(self.chapter_page_limit)), ('offset', str(offset)), ('order[updatedAt]', 'asc')]
+        query.extend(('translatedLanguage[]', v) for v in self.item_languages)
+        if since:
+            query.append(('updatedAtSince', since))
+
+        return self.__mangadex_get('/chapter', query, chapter_of)
+
+    def __chapter_mangas(self, chapters: list[Chapter], processed: set[str]):
+        manga_ids: list[str] = []
+        for chapter in chapters:
+            for relationship in chapter.relationships or []:
+                if relationship.type != 'manga' or not relationship.id:
+                    continue
+
+                if relationship.id not in processed and relationship.id not in manga_ids:
+                    manga_ids.append(relationship.id)
+
+        mangas = []
+        if manga_ids:
+            query = [('limit', str(len(manga_ids)))]
+            query.extend(('ids[]', v) for v in manga_ids)
+
+            mangas = self.__mangadex_get('/manga', query, manga_of)
+
+        return mangas
+
+    def __manga_feed(
+        self,
+        manga_id: str,
+        comic_code: str,
+        max_comic_chapter: int | None = None,
+        incremental: bool = False,
+        offset: int = 0
+    ):
+        total_comic_chapter = 0
+
+        state_key = f'{self.state_feed_updated_at} {manga_id}'
+        since = self.__state(state_key, incremental)
+
+        writes = WriteGraph(self.write_concurrency)
+        checked = None
+
+        def flush(page: int | None = None):
+            writes.run()
+
+            if incremental and checked:
+                self.__checkpoint(state_key, checked)
+            if page:
+                self.__save(incremental, manga_id=manga_id, feed_offset=page*self.feed_page_limit)
+
+        with closing(self.iter_manga_chapters(manga_id, since, incremental, offset)) as records:
+            for record in records:
+                if max_comic_chapter and total_comic_chapter > max_comic_chapter - 1 or self.__exhausted():
+                    flush()
+                    return False
+
+                comic_chapter_nv, comic_chapter_exist = self.__manga_chapter(
+                    comic_code, record.chapter, record.link, writes
+                )
+
+                self.__checked(record, comic_code, comic_chapter_nv, comic_chapter_exist)
+
+                if comic_chapter_nv or not comic_chapter_exist:
+                    total_comic_chapter += 1
+
+                checked = record.chapter
+                if record.last:
+                    flush(record.page)
+
+        flush()
+
+        return True
+
+    def __checked(self, record: ChapterRecord, comic_code: str, comic_chapter_nv: str | None, exist: bool):
+        self.bot.event(
+            'chapter_checked',
+            'MangaDex chapter ID %s check complete' % record.chapter.id,
+            manga_id=record.manga_id,
+            chapter_id=record.chapter.id,
+            comic_code=comic_code,
+            chapter=comic_chapter_nv,
+            exist=exist
+        )
+
+    def __manga_complete(
+        self,
+        manga: Manga,
+        max_comic_chapter: int | None = None,
+        incremental: bool = False,
+        feed_offset: int = 0
+    ):
+        self.note()
+        self.note('Check MangaDex manga ID %s' % manga.id)
+
+        comic_code, comic_exist = self.__manga(manga)
+
+        complete = True
+        if comic_code:
+            complete = self.__manga_feed(manga.id, comic_code, max_comic_chapter, incremental, feed_offset)
+
+        self.bot.event(
+            'manga_checked',
+            'MangaDex manga ID %s check complete' % manga.id,
+            manga_id=manga.id,
+            comic_code=comic_code,
+            exist=comic_exist,
+            complete=complete
+        )
+        self.note()
+
+        return comic_code, comic_exist, complete
+
+    def __defer(self, manga: Manga, e: Exception):
+        self.retry_queue.append(manga)
+
+        self.bot.event(
+            'deferred',
+            'MangaDex manga ID %s deferred by %s: %s' % (manga.id, type(e).__name__, e),
+            logging.WARNING,
+            manga_id=manga.id,
+            type=type(e).__name__
+        )
+
+        return None, False, False
+
+    def retry_deferred(self, max_comic_chapter: int | None = None, incremental: bool = False):
+        mangas, self.retry_queue = self.retry_queue, []
+
+        for manga in mangas:
+            if self.__exhausted():
                 break
 
-            for manga in response.data:
+            try:
+                self.__manga_complete(manga, max_comic_chapter, incremental)
+            except self.retry_errors as e:
+                self.bot.event(
+                    'error',
+                    'MangaDex manga ID %s failed by %s: %s' % (manga.id, type(e).__name__, e),
+                    logging.ERROR,
+                    manga_id=manga.id,
+                    type=type(e).__name__
+                )
+
+    def scrap_comics_complete(
+        self,
+        max_comic: int | None = None,
+        max_comic_chapter: int | None = None,
+        incremental: bool = False
+    ):
+        if incremental and not self.bot.catalog:
+            raise ValueError('Incremental scrap requires a catalog')
+        if incremental and self.shards > 1:
+            raise ValueError('Incremental scrap cannot be sharded')
+
+        started = since_of(datetime.now(timezone.utc).isoformat())
+
+        total_comic = 0
+        processed: set[str] = set()
+
+        #
+        # Manga
+        #
+
+        since = self.__state(self.state_manga_updated_at, incremental)
+        checkpoint = incremental
+
+        offset, cursor, resume_manga_id, resume_feed_offset = self.__resume(incremental)
+
+        capped = False
+        with closing(self.iter_manga(since, incremental, offset, cursor)) as records:
+            for record in records:
                 if max_comic and total_comic > max_comic - 1:
+                    capped = True
                     break
 
+                manga = record.manga
+
+                try:
+                    comic_code, comic_exist, complete = self.__manga_complete(
+                        manga,
+                        max_comic_chapter,
+                        incremental,
+                        resume_feed_offset if manga.id == resume_manga_id else 0
+                    )
+                except self.retry_errors as e:
+                    comic_code, comic_exist, complete = self.__defer(manga, e)
+                processed.add(manga.id)
+
+                if comic_code and not comic_exist:
+                    total_comic += 1
+
+                checkpoint = checkpoint and complete
+                if checkpoint:
+                    self.__checkpoint(self.state_manga_updated_at, manga)
+
+                self.__save_manga(incremental, record)
+
+        if self.checkpoint and not incremental and not capped:
+            self.checkpoint.clear()
+
+        if not incremental:
+            return
+
+        #
+        # Chapter
+        #
+
+        since = self.__chapter_state(started)
+        checkpoint = True
+
+        pages = self.__chapter_pages(since)
+        while True:
+            chapters, last = pages()
+            mangas = self.__chapter_mangas(chapters, processed)
+
+            for manga in mangas:
                 if not manga.id:
                     continue
 
-                self.note()
-                self.note('Check MangaDex manga ID %s' % manga.id)
+                # Past the cap only manga already mapped to a comic are followed, the rest wait for the next run
 
-                comic_code, comic_exist = self.__manga(manga)
+                if max_comic and total_comic > max_comic - 1 and not self.__mapped(manga):
+                    checkpoint = False
+                    continue
 
-                if comic_code:
-                    total_comic_chapter = 0
+                try:
+                    comic_code, comic_exist, complete = self.__manga_complete(manga, max_comic_chapter, incremental)
+                except self.retry_errors as e:
+                    comic_code, comic_exist, complete = self.__defer(manga, e)
+                processed.add(manga.id)
 
-                    page1 = 1
-                    while True:
-                        if max_comic_chapter and total_comic_chapter > max_comic_chapter - 1:
-                            break
+                if comic_code and not comic_exist:
+                    total_comic += 1
 
-                        response1 = api2.get_manga_id_feed(
-                            manga.id,
-                            limit=50,
-                            offset=(page1-1)*50
-                        )
-                        if not response1.data:
-                            break
+                checkpoint = checkpoint and complete
 
-                        for comic_chapter in response1.data:
-                            if max_comic_chapter and total_comic_chapter > max_comic_chapter - 1:
-                                break
+            if checkpoint and chapters:
+                self.__checkpoint(self.state_chapter_updated_at, chapters[-1])
 
-                            if not comic_chapter.id:
-                                continue
+            if last:
+                break
+
+    def __exhausted(self):
+        return bool(self.budget and self.budget.exhausted())
+
+    def __candidates(self):
+        mangas: list[Manga] = []
+
+        page = 1
+        while len(mangas) < self.candidates and not self.__exhausted():
+            limit = min(self.candidate_page_limit, self.candidates - len(mangas))
+            query = [
+                ('limit', str(limit)),
+                ('offset', str((page-1)*self.candidate_page_limit)),
+                ('order[latestUploadedChapter]', 'desc')
+            ]
+            query.extend(('availableTranslatedLanguage[]', v) for v in self.item_languages)
+
+            response = self.__mangadex_get('/manga', query, manga_of)
+            mangas.extend(v for v in response if v.id)
+            if len(response) < limit:
+                break
 
-                            self.note('Check MangaDex chapter ID %s' % comic_chapter.id)
+            page += 1
+
+        follows: dict[str, int] = {}
+        for i in range(0, len(mangas), self.manga_batch_size):
+            query = [('manga[]', v.id) for v in mangas[i:i + self.manga_batch_size]]
+
+            statistics = self.__mangadex_json('/statistics/manga', query).get('statistics') or {}
+            for k, v in statistics.items():
+                follows[k] = (v or {}).get('follows') or 0
+
+        # Manga already mapped to a comic come first, then the most followed, then the latest uploaded
+
+        candidates = [
+            ((not self.bot.cached(Catalog.kind_mangadex_manga, v.id), -follows.get(v.id, 0), i), v)
+            for i, v in enumerate(mangas)
+        ]
+        heapq.heapify(candidates)
+
+        return candidates
+
+    def scrap_comics_priority(
+        self,
+        max_comic: int | None = None,
+        max_comic_chapter: int | None = None,
+        incremental: bool = False
+    ):
+        if not self.budget:
+            raise ValueError('Prioritized scrap requires a budget')
+        if incremental:
+            raise ValueError('Prioritized scrap cannot be incremental')
+        if self.shards > 1:
+            raise ValueError('Prioritized scrap cannot be sharded')
+
+        self.budget.start(self.bot.metrics)
+
+        total_comic = 0
+
+        candidates = self.__candidates()
+        while candidates:
+            if max_comic and total_comic > max_comic - 1 or self.__exhausted():
+                break
+
+            _, manga = heapq.heappop(candidates)
 
-                            comic_chapter_nv, comic_chapter_exist = self.__manga_chapter(comic_code, comic_chapter)
+            try:
+                comic_code, comic_exist, _ = self.__manga_complete(manga, max_comic_chapter)
+            except self.retry_errors as e:
+                comic_code, comic_exist, _ = self.__defer(manga, e)
+
+            if comic_code and not comic_exist:
+                total_comic += 1
+
+        self.bot.event(
+            'budget',
+            'Prioritized scrap stopped with %s candidates left' % len(candidates),
+            logging.INFO,
+            remaining=len(candidates),
+            exhausted=self.budget.exhausted()
+        )
+
+    async def __manga_feed_async(
+        self,
+        manga_id: str,
+        comic_code: str,
+        max_comic_chapter: int | None = None,
+        incremental: bool = False,
+        concurrency: int = 4,
+        offset: int = 0
+    ):
+        total_comic_chapter = 0
 
-                            self.note("MangaDex chapter ID %s check complete" % comic_chapter.id)
+        state_key = f'{self.state_feed_updated_at} {manga_id}'
+        since = self.__state(state_key, incremental)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def manga_chapter(record: ChapterRecord, writes: WriteGraph):
+            async with semaphore:
+                comic_chapter_nv, comic_chapter_exist = await asyncio.to_thread(
+                    self.__manga_chapter, comic_code, record.chapter, record.link, writes
+                )
+
+                self.__checked(record, comic_code, comic_chapter_nv, comic_chapter_exist)
+
+        pages = self.__manga_chapter_pages(manga_id, since, incremental, offset)
+        try:
+            while True:
+                if max_comic_chapter and total_comic_chapter > max_comic_chapter - 1 or self.__exhausted():
+                    return False
 
-                            if comic_chapter_nv or not comic_chapter_exist:
-                                total_comic_chapter += 1
-                                time.sleep(5)
+                records = await asyncio.to_thread(next, pages, None)
+                if records is None:
+                    return True
 
-                        page1 += 1
-                        time.sleep(3)
+                if max_comic_chapter:
+                    records = records[:max_comic_chapter - total_comic_chapter]
 
-                self.note("MangaDex manga ID %s check complete" % manga.id)
-                self.note()
+                writes = WriteGraph(self.write_concurrency)
+                await asyncio.gather(*(manga_chapter(v, writes) for v in records))
+                await asyncio.to_thread(writes.run)
+
+                total_comic_chapter += len(records)
+
+                if incremental and records:
+                    self.__checkpoint(state_key, records[-1].chapter)
+        finally:
+            await asyncio.to_thread(pages.close)
+
+    async def __manga_complete_async(
+        self,
+        manga: Manga,
+        max_comic_chapter: int | None = None,
+        incremental: bool = False,
+        concurrency: int = 4,
+        feed_offset: int = 0
+    ):
+        self.note()
+        self.note('Check MangaDex manga ID %s' % manga.id)
+
+        comic_code, comic_exist = await asyncio.to_thread(self.__manga, manga)
+
+        complete = True
+        if comic_code:
+            complete = await self.__manga_feed_async(
+                manga.id, comic_code, max_comic_chapter, incremental, concurrency, feed_offset
+            )
+
+        self.bot.event(
+            'manga_checked',
+            'MangaDex manga ID %s check complete' % manga.id,
+            manga_id=manga.id,
+            comic_code=comic_code,
+            exist=comic_exist,
+            complete=complete
+        )
+        self.note()
+
+        return comic_code, comic_exist, complete
+
+    async def scrap_comics_complete_async(
+        self,
+        max_comic: int | None = None,
+        max_comic_chapter: int | None = None,
+        incremental: bool = False,
+        concurrency: int = 4
+    ):
+        if incremental and not self.bot.catalog:
+            raise ValueError('Incremental scrap requires a catalog')
+        if incremental and self.shards > 1:
+            raise ValueError('Incremental scrap cannot be sharded')
+
+        started = since_of(datetime.now(timezone.utc).isoformat())
+
+        total_comic = 0
+        processed: set[str] = set()
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def manga_complete(manga: Manga, feed_offset: int = 0, mapped: bool = False):
+            nonlocal total_comic
+
+            async with semaphore:
+                if max_comic and total_comic > max_comic - 1 and not (mapped and self.__mapped(manga)):
+                    return False
+
+                try:
+                    comic_code, comic_exist, complete = await self.__manga_complete_async(
+                        manga, max_comic_chapter, incremental, concurrency, feed_offset
+                    )
+                except self.retry_errors as e:
+                    comic_code, comic_exist, complete = self.__defer(manga, e)
+                processed.add(manga.id)
 
                 if comic_code and not comic_exist:
                     total_comic += 1
-                    time.sleep(5)
 
-            page += 1
-            time.sleep(3)
+                return complete
+
+        #
+        # Manga
+        #
+
+        since = self.__state(self.state_manga_updated_at, incremental)
+        checkpoint = incremental
+
+        # Manga in a page run concurrently, so progress is only saved per completed page
+
+        offset, cursor, resume_manga_id, resume_feed_offset = self.__resume(incremental)
+
+        capped = False
+        pages = self.__manga_pages(since, incremental, offset, cursor)
+        try:
+            while True:
+                if max_comic and total_comic > max_comic - 1:
+                    capped = True
+                    break
+
+                records = await asyncio.to_thread(next, pages, None)
+                if records is None:
+                    break
+
+                completes = await asyncio.gather(*(
+                    manga_complete(v.manga, resume_feed_offset if v.manga.id == resume_manga_id else 0)
+                    for v in records
+                ))
+
+                checkpoint = checkpoint and all(completes)
+                if checkpoint and records:
+                    self.__checkpoint(self.state_manga_updated_at, records[-1].manga)
+
+                if records and not (max_comic and total_comic > max_comic - 1):
+                    self.__save_manga(incremental, records[-1])
+        finally:
+            await asyncio.to_thread(pages.close)
+
+        if self.checkpoint and not incremental and not capped:
+            self.checkpoint.clear()
+
+        if not incremental:
+            return
+
+        #
+        # Chapter
+        #
+
+        since = self.__chapter_state(started)
+        checkpoint = True
+
+        pages = self.__chapter_pages(since)
+        while True:
+            chapters, last = await asyncio.to_thread(pages)
+            mangas = await asyncio.to_thread(self.__chapter_mangas, chapters, processed)
+
+            # Past the cap only manga already mapped to a comic are followed, the rest wait for the next run
+
+            mangas = [v for v in mangas if v.id]
+            completes = await asyncio.gather(*(manga_complete(v, mapped=True) for v in mangas))
+
+            checkpoint = checkpoint and all(completes)
+            if checkpoint and chapters:
+                self.__checkpoint(self.state_chapter_updated_at, chapters[-1])
+
+            if last:
+                break
+
+    async def scrap_comics_priority_async(
+        self,
+        max_comic: int | None = None,
+        max_comic_chapter: int | None = None,
+        incremental: bool = False,
+        concurrency: int = 4
+    ):
+        if not self.budget:
+            raise ValueError('Prioritized scrap requires a budget')
+        if incremental:
+            raise ValueError('Prioritized scrap cannot be incremental')
+        if self.shards > 1:
+            raise ValueError('Prioritized scrap cannot be sharded')
+
+        self.budget.start(self.bot.metrics)
+
+        total_comic = 0
+
+        candidates = await asyncio.to_thread(self.__candidates)
+
+        async def manga_complete(manga: Manga):
+            nonlocal total_comic
+
+            try:
+                comic_code, comic_exist, _ = await self.__manga_complete_async(
+                    manga, max_comic_chapter, False, concurrency
+                )
+            except self.retry_errors as e:
+                comic_code, comic_exist, _ = self.__defer(manga, e)
+
+            if comic_code and not comic_exist:
+                total_comic += 1
+
+        # The highest ranked manga are taken in batches, so the budget is checked between them
+
+        while candidates:
+            if max_comic and total_comic > max_comic - 1 or self.__exhausted():
+                break
+
+            mangas = [heapq.heappop(candidates)[1] for _ in range(min(concurrency, len(candidates)))]
+            await asyncio.gather(*(manga_complete(v) for v in mangas))
+
+        self.bot.event(
+            'budget',
+            'Prioritized scrap stopped with %s candidates left' % len(candidates),
+            logging.INFO,
+            remaining=len(candidates),
+            exhausted=self.budget.exhausted()
+        )
+
+def since_of(value: str):
+    return datetime.fromisoformat(value).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+def updated_of(entity: Manga | Chapter):
+    if not entity.attributes or not entity.attributes.updated_at:
+        return ''
+
+    return since_of(entity.attributes.updated_at)
@@ -0,0 +1,90 @@
+import time
+import sqlite3
+import threading
+
+class Catalog:
+    kind_language = 'language'
+    kind_website = 'website'
+    kind_website_item_language = 'website_item_language'
+    kind_link = 'link'
+    kind_link_item_language = 'link_item_language'
+    kind_comic = 'comic'
+    kind_comic_destination_link = 'comic_destination_link'
+    kind_comic_chapter = 'comic_chapter'
+    kind_comic_chapter_destination_link = 'comic_chapter_destination_link'
+    kind_mangadex_manga = 'mangadex_manga'
+    kind_mangadex_manga_unmapped = 'mangadex_manga_unmapped'
+    kind_mangadex_chapter = 'mangadex_chapter'
+    kind_mal_comic = 'mal_comic'
+
+    def __init__(self, path: str, ttl: float | None = 7 * 24 * 60 * 60):
+        self.ttl = ttl
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS catalog ('
+            'kind TEXT NOT NULL, '
+            'key TEXT NOT NULL, '
+            'value TEXT NOT NULL, '
+            'checked_at REAL NOT NULL, '
+            'PRIMARY KEY (kind, key))'
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS state ('
+            'key TEXT NOT NULL PRIMARY KEY, '
+            'value TEXT NOT NULL)'
+        )
+        self.connection.commit()
+
+        self.lock = threading.Lock()
+
+    def get(self, kind: str, key: str, ttl: float | None = None):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT value, checked_at FROM catalog WHERE kind = ? AND key = ?',
+                (kind, key)
+            ).fetchone()
+
+        if not row:
+            return None
+
+        value, checked_at = row
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and checked_at + ttl < time.time():
+            return None
+
+        return value
+
+    def has(self, kind: str, key: str):
+        return self.get(kind, key) is not None
+
+    def put(self, kind: str, key: str, value: str = ''):
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO catalog (kind, key, value, checked_at) VALUES (?, ?, ?, ?)',
+                (kind, key, value, time.time())
+            )
+            self.connection.commit()
+
+    def get_state(self, key: str):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT value FROM state WHERE key = ?',
+                (key,)
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def put_state(self, key: str, value: str):
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+                (key, value)
+            )
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
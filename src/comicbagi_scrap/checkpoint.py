@@ -0,0 +1,48 @@
+import os
+import json
+import threading
+from typing import Any
+
+class Checkpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self.state: dict[str, Any] = {}
+
+        self.lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+
+        with self.lock:
+            self.state = state if isinstance(state, dict) else {}
+
+        return self.state
+
+    def get(self, key: str, default: Any = None):
+        with self.lock:
+            return self.state.get(key, default)
+
+    def update(self, **values: Any):
+        with self.lock:
+            self.state.update(values)
+
+            path_temp = f'{self.path}.{os.getpid()}.tmp'
+            with open(path_temp, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(path_temp, self.path)
+
+    def clear(self):
+        with self.lock:
+            self.state = {}
+
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
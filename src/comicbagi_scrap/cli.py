@@ -0,0 +1,372 @@
+import os
+import sys
+import math
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+import importlib
+import multiprocessing
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog='comicbagi-scrap')
+    parser.add_argument(
+        '--profile-import',
+        action='store_true',
+        help='print how long each module takes to import, then exit'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='continue from the checkpoint left by an interrupted run'
+    )
+    parser.add_argument(
+        '--shards',
+        type=int,
+        help='split the MangaDex catalog across this many worker processes'
+    )
+    parser.add_argument(
+        '--warm-mal-cache',
+        action='store_true',
+        help='cache MAL ID to comic code for comics already in ComicBagi, then exit'
+    )
+    args = parser.parse_args(argv)
+
+    if args.profile_import:
+        # The generated clients come first, so the modules after them only show their own cost
+
+        imports: dict[str, float] = {}
+        for name in [
+            'comicbagi_openapi',
+            'mangadex_openapi',
+            'dotenv',
+            '.ratelimit',
+            '.transport',
+            '.oauth',
+            '.catalog',
+            '.checkpoint',
+            '.snapshot',
+            '.metrics',
+            '.journal',
+            '.bot',
+            'comicking_scrap',
+            '.bot_mangadex'
+        ]:
+            start = time.perf_counter()
+            importlib.import_module(name, __package__)
+            imports[name] = time.perf_counter() - start
+
+        for k, v in imports.items():
+            print(f'{k}: {v * 1000:.1f} ms', file=sys.stderr)
+        print(f'total: {sum(imports.values()) * 1000:.1f} ms', file=sys.stderr)
+        return
+
+    import dotenv
+
+    dotenv.load_dotenv()
+
+    configure_logging()
+
+    shards = args.shards or int(os.getenv('COMICBAGI_SCRAP_SHARDS') or 1)
+    if shards > 1 and not args.warm_mal_cache:
+        run_shards(args, shards)
+    else:
+        run(args)
+
+def run(
+    args: argparse.Namespace,
+    shard: int = 0,
+    shards: int = 1,
+    coordinator=None,
+    directory: str | None = None
+):
+    import comicking_scrap
+    from . import ratelimit
+    from .transport import Transport
+    from .retry import RetryPolicy
+    from .oauth import TokenCache
+    from .catalog import Catalog
+    from .checkpoint import Checkpoint
+    from .snapshot import Snapshot
+    from .journal import Journal
+    from .scheduler import Budget
+    from .bot import Bot
+    from .bot_mangadex import BotMangaDex
+
+    configure_logging()
+    logger = logging.getLogger(__package__)
+
+    journal = None
+    note_file = None
+    if os.getenv('COMICBAGI_SCRAP_JOURNAL') != '':
+        journal = Journal(
+            os.path.join(directory, f'bot.{shard}.jsonl') if directory else journal_path_of(),
+            logger=logger,
+            max_bytes=0 if directory else int(os.getenv('COMICBAGI_SCRAP_JOURNAL_MAX_BYTES') or 64 * 1024 * 1024),
+            backups=int(os.getenv('COMICBAGI_SCRAP_JOURNAL_BACKUPS') or 3),
+            fields={'shard': shard} if shards > 1 else None
+        )
+    else:
+        note_path = os.path.join(directory, f'bot.{shard}.txt') if directory else 'bot.txt'
+        note_file = open(note_path, 'a', encoding='utf-8')
+
+    rates = {}
+    for k, v in {
+        os.getenv('COMICBAGI_SCRAP_BASE_COMICBAGI') or '': os.getenv('COMICBAGI_SCRAP_RATE_COMICBAGI'),
+        os.getenv('COMICBAGI_SCRAP_OAUTH_ISSUER') or '': os.getenv('COMICBAGI_SCRAP_RATE_OAUTH'),
+        'api.mangadex.org': os.getenv('COMICBAGI_SCRAP_RATE_MANGADEX')
+    }.items():
+        if k and v:
+            rates[k] = ratelimit.rate_of(v)
+    concurrency = {}
+    for k, v in {
+        os.getenv('COMICBAGI_SCRAP_BASE_COMICBAGI') or '': os.getenv('COMICBAGI_SCRAP_CONCURRENCY_COMICBAGI'),
+        'api.mangadex.org': os.getenv('COMICBAGI_SCRAP_CONCURRENCY_MANGADEX')
+    }.items():
+        if k and v:
+            concurrency[k] = int(v)
+    rate_limiter = ratelimit.RateLimiter(rates, concurrency=concurrency, coordinator=coordinator)
+
+    transport = Transport(
+        pool_size=int(os.getenv('COMICBAGI_SCRAP_POOL_SIZE') or 10),
+        connect_timeout=float(os.getenv('COMICBAGI_SCRAP_CONNECT_TIMEOUT') or 10),
+        read_timeout=float(os.getenv('COMICBAGI_SCRAP_READ_TIMEOUT') or 60),
+        http2=(os.getenv('COMICBAGI_SCRAP_HTTP2') or '0') == '1',
+        logger=logger
+    )
+
+    retry_policy = RetryPolicy(
+        retries=int(os.getenv('COMICBAGI_SCRAP_RETRIES') or 4),
+        backoff=float(os.getenv('COMICBAGI_SCRAP_RETRY_BACKOFF') or 0.5),
+        max_backoff=float(os.getenv('COMICBAGI_SCRAP_RETRY_MAX_BACKOFF') or 60),
+        breaker_threshold=int(os.getenv('COMICBAGI_SCRAP_BREAKER_THRESHOLD') or 5),
+        breaker_cooldown=float(os.getenv('COMICBAGI_SCRAP_BREAKER_COOLDOWN') or 30),
+        logger=logger
+    )
+
+    token_cache = None
+    if os.getenv('COMICBAGI_SCRAP_TOKEN_CACHE') != '':
+        token_cache = TokenCache(
+            os.path.expanduser(os.getenv('COMICBAGI_SCRAP_TOKEN_CACHE') or '~/.cache/comicbagi-scrap')
+        )
+
+    metrics = metrics_of()
+    if directory:
+        metrics.json_path = os.path.join(directory, f'metrics.{shard}.json')
+        metrics.prometheus_path = None
+
+    catalog = None
+    if os.getenv('COMICBAGI_SCRAP_CATALOG') != '':
+        catalog = Catalog(
+            os.getenv('COMICBAGI_SCRAP_CATALOG') or 'bot.db',
+            ttl=float(os.getenv('COMICBAGI_SCRAP_CATALOG_TTL') or 7 * 24 * 60 * 60)
+        )
+
+    # Everything opened above is closed even when the bot fails to start
+
+    bot = None
+    try:
+        checkpoint = None
+        if os.getenv('COMICBAGI_SCRAP_CHECKPOINT') != '':
+            checkpoint = Checkpoint(
+                shard_path_of(os.getenv('COMICBAGI_SCRAP_CHECKPOINT') or 'bot-checkpoint.json', shard, shards)
+            )
+            if args.resume: checkpoint.load()
+
+        snapshot = None
+        if os.getenv('COMICBAGI_SCRAP_SNAPSHOT') != '':
+            snapshot = Snapshot(
+                os.getenv('COMICBAGI_SCRAP_SNAPSHOT') or 'bot-snapshot.json',
+                os.getenv('COMICBAGI_SCRAP_BASE_COMICBAGI') or '',
+                ttl=float(os.getenv('COMICBAGI_SCRAP_SNAPSHOT_TTL') or 24 * 60 * 60)
+            )
+
+        bot = Bot(
+            os.getenv('COMICBAGI_SCRAP_BASE_COMICBAGI') or '',
+            oauth_issuer=os.getenv('COMICBAGI_SCRAP_OAUTH_ISSUER') or '',
+            oauth_client_id=os.getenv('COMICBAGI_SCRAP_OAUTH_CLIENT_ID') or '',
+            oauth_client_secret=os.getenv('COMICBAGI_SCRAP_OAUTH_CLIENT_SECRET') or '',
+            oauth_audience=os.getenv('COMICBAGI_SCRAP_OAUTH_AUDIENCE') or '',
+            logger=logger,
+            note_file=note_file,
+            rate_limiter=rate_limiter,
+            catalog=catalog,
+            transport=transport,
+            token_cache=token_cache,
+            metrics=metrics,
+            journal=journal,
+            snapshot=snapshot,
+            retry_policy=retry_policy
+        )
+        bot.load(True)
+        bot.start_refresh()
+
+        bot_comicking = comicking_scrap.Bot(
+            os.getenv('COMICBAGI_SCRAP_BASE_COMICKING') or '',
+            oauth_issuer=os.getenv('COMICBAGI_SCRAP_OAUTH_ISSUER') or '',
+            oauth_client_id=os.getenv('COMICBAGI_SCRAP_OAUTH_CLIENT_ID') or '',
+            oauth_client_secret=os.getenv('COMICBAGI_SCRAP_OAUTH_CLIENT_SECRET') or '',
+            oauth_audience=os.getenv('COMICBAGI_SCRAP_OAUTH_AUDIENCE') or '',
+            logger=logger,
+            note_file=journal or note_file
+        )
+        bot_comicking.load(True)
+
+        bot_comicking_jikan = comicking_scrap.BotJikan(
+            bot_comicking,
+            logger=logger
+        )
+        bot_comicking_jikan.load(True)
+
+        budget = None
+        if os.getenv('COMICBAGI_SCRAP_BUDGET_SECONDS') or os.getenv('COMICBAGI_SCRAP_BUDGET_REQUESTS'):
+            budget = Budget(
+                seconds=float(os.getenv('COMICBAGI_SCRAP_BUDGET_SECONDS') or 0) or None,
+                requests=int(os.getenv('COMICBAGI_SCRAP_BUDGET_REQUESTS') or 0) or None
+            )
+
+        # With a budget the new comic and chapter counts are unlimited unless set
+
+        max_new_comic = int(os.getenv('COMICBAGI_SCRAP_MAX_NEW_COMIC') or (0 if budget else 1))
+        max_new_comic_chapter = int(os.getenv('COMICBAGI_SCRAP_MAX_NEW_COMIC_CHAPTER') or (0 if budget else 10))
+
+        # Shard workers split the new comics between them, the chapter count is per comic
+
+        if max_new_comic and shards > 1:
+            max_new_comic = math.ceil(max_new_comic / shards)
+
+        bot_mangadex = BotMangaDex(
+            bot,
+            comicking_jikan_bot=bot_comicking_jikan,
+            logger=logger,
+            write_concurrency=int(os.getenv('COMICBAGI_SCRAP_WRITE_CONCURRENCY') or 4),
+            prefetch_pages=int(os.getenv('COMICBAGI_SCRAP_PREFETCH_PAGES') or 2),
+            checkpoint=checkpoint,
+            shard=shard,
+            shards=shards,
+            mal_comic_ttl=float(os.getenv('COMICBAGI_SCRAP_MAL_CACHE_TTL') or 30 * 24 * 60 * 60),
+            unmapped_ttl=float(os.getenv('COMICBAGI_SCRAP_UNMAPPED_TTL') or 7 * 24 * 60 * 60),
+            budget=budget,
+            candidates=int(os.getenv('COMICBAGI_SCRAP_BUDGET_CANDIDATES') or 500),
+            full_scan=(os.getenv('COMICBAGI_SCRAP_FULL_SCAN') or '0') == '1'
+        )
+        if args.warm_mal_cache:
+            bot_mangadex.warm_mal_comics()
+        elif int(os.getenv('COMICBAGI_SCRAP_CONCURRENCY') or 1) > 1:
+            asyncio.run(bot_mangadex.process_async(
+                max_new_comic,
+                max_new_comic_chapter,
+                incremental=(os.getenv('COMICBAGI_SCRAP_INCREMENTAL') or '0') == '1',
+                concurrency=int(os.getenv('COMICBAGI_SCRAP_CONCURRENCY') or 1)
+            ))
+        else:
+            bot_mangadex.process(
+                max_new_comic,
+                max_new_comic_chapter,
+                incremental=(os.getenv('COMICBAGI_SCRAP_INCREMENTAL') or '0') == '1'
+            )
+    finally:
+        if bot: bot.stop_refresh()
+        if catalog: catalog.close()
+        transport.clear()
+        if journal: journal.close()
+        if note_file: note_file.close()
+
+def run_shards(args: argparse.Namespace, shards: int):
+    from .metrics import merge_of
+    from .journal import Journal
+    from .ratelimit import CoordinatorManager
+
+    logger = logging.getLogger(__package__)
+
+    # Workers share one token bucket per upstream through the coordinator process
+
+    with tempfile.TemporaryDirectory(prefix='comicbagi-scrap-') as directory, CoordinatorManager() as manager:
+        coordinator = manager.Coordinator()
+
+        processes = [
+            multiprocessing.Process(
+                target=run,
+                args=(args, i, shards, coordinator, directory),
+                name=f'comicbagi-scrap-shard-{i}'
+            )
+            for i in range(shards)
+        ]
+        for v in processes:
+            v.start()
+        for v in processes:
+            v.join()
+
+        if os.getenv('COMICBAGI_SCRAP_JOURNAL') != '':
+            journal = Journal(
+                journal_path_of(),
+                logger=logger,
+                max_bytes=int(os.getenv('COMICBAGI_SCRAP_JOURNAL_MAX_BYTES') or 64 * 1024 * 1024),
+                backups=int(os.getenv('COMICBAGI_SCRAP_JOURNAL_BACKUPS') or 3)
+            )
+            for i in range(shards):
+                path = os.path.join(directory, f'bot.{i}.jsonl')
+                if not os.path.exists(path):
+                    continue
+
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        journal.put(json.loads(line))
+            journal.close()
+        else:
+            with open('bot.txt', 'a', encoding='utf-8') as note_file:
+                for i in range(shards):
+                    path = os.path.join(directory, f'bot.{i}.txt')
+                    if not os.path.exists(path):
+                        continue
+
+                    with open(path, encoding='utf-8') as f:
+                        shutil.copyfileobj(f, note_file)
+
+        snapshots = []
+        for i in range(shards):
+            try:
+                with open(os.path.join(directory, f'metrics.{i}.json'), encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+        metrics_of().write_snapshot(merge_of(snapshots))
+
+    failed = [v.name for v in processes if v.exitcode]
+    if failed:
+        logger.error('Shard %s failed', ', '.join(failed))
+        sys.exit(1)
+
+def configure_logging():
+    logging.basicConfig(level=(os.getenv('COMICBAGI_SCRAP_LOG_LEVEL') or 'INFO').upper())
+
+    # Generated clients and urllib3 log every request, keep them off the hot path by default
+
+    for name in ['urllib3', 'comicbagi_openapi', 'mangadex_openapi']:
+        logging.getLogger(name).setLevel((os.getenv('COMICBAGI_SCRAP_LOG_LEVEL_HTTP') or 'WARNING').upper())
+
+def journal_path_of():
+    return os.getenv('COMICBAGI_SCRAP_JOURNAL') or 'bot.jsonl'
+
+def metrics_of():
+    from .metrics import Metrics
+
+    metrics = Metrics()
+    if os.getenv('COMICBAGI_SCRAP_METRICS_JSON') != '':
+        metrics.json_path = os.getenv('COMICBAGI_SCRAP_METRICS_JSON') or 'bot-metrics.json'
+    if os.getenv('COMICBAGI_SCRAP_METRICS_PROMETHEUS') != '':
+        metrics.prometheus_path = os.getenv('COMICBAGI_SCRAP_METRICS_PROMETHEUS') or 'bot.prom'
+
+    return metrics
+
+def shard_path_of(path: str, shard: int, shards: int):
+    if shards < 2:
+        return path
+
+    root, ext = os.path.splitext(path)
+
+    return f'{root}.{shard}{ext}'
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from typing import Any, Iterable
+
+class Journal:
+    def __init__(
+        self,
+        path: str,
+        logger: logging.Logger,
+        max_bytes: int = 64 * 1024 * 1024,
+        backups: int = 3,
+        batch_size: int = 512,
+        fields: dict[str, Any] | None = None
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = max(batch_size, 1)
+        self.fields = fields or {}
+
+        self.logger = logger
+
+        self.queue: queue.SimpleQueue[dict[str, Any] | None] = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.__write, name='comicbagi-journal', daemon=True)
+        self.thread.start()
+
+    def event(self, event: str, **fields: Any):
+        self.queue.put({'time': round(time.time(), 3), 'event': event, **self.fields, **fields})
+
+    def put(self, record: dict[str, Any]):
+        self.queue.put(record)
+
+    def writelines(self, lines: Iterable[str]):
+        message = ''.join(lines).strip()
+        if message:
+            self.event('note', message=message)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def __write(self):
+        file = open(self.path, 'ab')
+        size = file.tell()
+
+        closed = False
+        while not closed:
+            records = [self.queue.get()]
+            while len(records) < self.batch_size:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in records:
+                closed = True
+                records = [v for v in records if v is not None]
+            if not records:
+                continue
+
+            data = ''.join(
+                json.dumps(v, separators=(',', ':'), ensure_ascii=False, default=str) + '\n' for v in records
+            ).encode('utf-8')
+
+            try:
+                if self.max_bytes and size and size + len(data) > self.max_bytes:
+                    file.close()
+                    try:
+                        self.__rotate()
+                    finally:
+                        file = open(self.path, 'ab')
+                        size = file.tell()
+
+                file.write(data)
+                file.flush()
+                size += len(data)
+            except OSError as e:
+                self.logger.warning('Journal write failed: %s', e)
+
+        file.close()
+
+    def __rotate(self):
+        if self.backups < 1:
+            os.remove(self.path)
+            return
+
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+
+        os.replace(self.path, f'{self.path}.1')
@@ -0,0 +1,225 @@
+import os
+import re
+import json
+import time
+import threading
+from urllib.parse import urlparse
+
+class Histogram:
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        for i, v in enumerate(self.buckets):
+            if seconds <= v:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        total, result = 0, []
+        for k, v in zip([*map(str, self.buckets), '+Inf'], self.counts):
+            total += v
+            result.append((k, total))
+
+        return result
+
+class Metrics:
+    prefix = 'comicbagi_scrap'
+
+    def __init__(self, json_path: str | None = None, prometheus_path: str | None = None):
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+
+        self.requests: dict[tuple[str, str], int] = {}
+        self.errors: dict[tuple[str, str], int] = {}
+        self.latencies: dict[tuple[str, str], Histogram] = {}
+        self.started = time.time()
+
+        self.operation = threading.local()
+        self.lock = threading.Lock()
+
+    def observe(self, service: str, operation: str, seconds: float, error: bool = False):
+        key = (service, operation)
+
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if error:
+                self.errors[key] = self.errors.get(key, 0) + 1
+            if key not in self.latencies:
+                self.latencies[key] = Histogram()
+            self.latencies[key].observe(seconds)
+
+    def count(self):
+        with self.lock:
+            return sum(self.requests.values())
+
+    def attach(self, client, service: str):
+        param_serialize = client.param_serialize
+        call_api = client.call_api
+
+        def named_param_serialize(*args, **kwargs):
+            method = kwargs.get('method', args[0] if args else None)
+            resource_path = kwargs.get('resource_path', args[1] if len(args) > 1 else None)
+
+            result = param_serialize(*args, **kwargs)
+
+            # Kept with the serialized URL, so retries of the call share its operation
+
+            self.operation.serialized = (result[1], f'{method} {resource_path}')
+
+            return result
+
+        def measured_call_api(method, url, *args, **kwargs):
+            serialized_url, operation = getattr(self.operation, 'serialized', None) or (None, None)
+            if serialized_url != url:
+                operation = f'{method} {operation_of(url)}'
+
+            start = time.perf_counter()
+            try:
+                response = call_api(method, url, *args, **kwargs)
+            except Exception:
+                self.observe(service, operation, time.perf_counter() - start, True)
+                raise
+
+            self.observe(service, operation, time.perf_counter() - start, response.status >= 400)
+
+            return response
+
+        client.param_serialize = named_param_serialize
+        client.call_api = measured_call_api
+
+        return client
+
+    def snapshot(self, rate_limited: float = 0, retry_paused: float = 0):
+        with self.lock:
+            operations = [
+                {
+                    'service': k[0],
+                    'operation': k[1],
+                    'requests': v,
+                    'errors': self.errors.get(k, 0),
+                    'seconds': self.latencies[k].sum,
+                    'buckets': dict(self.latencies[k].cumulative())
+                }
+                for k, v in sorted(self.requests.items())
+            ]
+
+        return {
+            'started_at': self.started,
+            'finished_at': time.time(),
+            'duration_seconds': time.time() - self.started,
+            'rate_limited_seconds': rate_limited,
+            'retry_paused_seconds': retry_paused,
+            'operations': operations
+        }
+
+    def prometheus(self, snapshot: dict):
+        p = self.prefix
+        lines = [
+            f'# HELP {p}_requests_total Requests sent per operation in the last run.',
+            f'# TYPE {p}_requests_total counter'
+        ]
+        for v in snapshot['operations']:
+            lines.append(f'{p}_requests_total{labels_of(v)} {v["requests"]}')
+
+        lines.append(f'# HELP {p}_request_errors_total Failed requests per operation in the last run.')
+        lines.append(f'# TYPE {p}_request_errors_total counter')
+        for v in snapshot['operations']:
+            lines.append(f'{p}_request_errors_total{labels_of(v)} {v["errors"]}')
+
+        lines.append(f'# HELP {p}_request_duration_seconds Request latency per operation in the last run.')
+        lines.append(f'# TYPE {p}_request_duration_seconds histogram')
+        for v in snapshot['operations']:
+            for le, count in v['buckets'].items():
+                lines.append(f'{p}_request_duration_seconds_bucket{labels_of(v, le=le)} {count}')
+            lines.append(f'{p}_request_duration_seconds_sum{labels_of(v)} {v["seconds"]}')
+            lines.append(f'{p}_request_duration_seconds_count{labels_of(v)} {v["requests"]}')
+
+        lines.append(f'# HELP {p}_rate_limited_seconds Time spent waiting on the rate limiter in the last run.')
+        lines.append(f'# TYPE {p}_rate_limited_seconds gauge')
+        lines.append(f'{p}_rate_limited_seconds {snapshot["rate_limited_seconds"]}')
+
+        lines.append(f'# HELP {p}_retry_paused_seconds Time spent in retry backoff and open circuits in the last run.')
+        lines.append(f'# TYPE {p}_retry_paused_seconds gauge')
+        lines.append(f'{p}_retry_paused_seconds {snapshot["retry_paused_seconds"]}')
+
+        lines.append(f'# HELP {p}_run_duration_seconds Duration of the last run.')
+        lines.append(f'# TYPE {p}_run_duration_seconds gauge')
+        lines.append(f'{p}_run_duration_seconds {snapshot["duration_seconds"]}')
+
+        lines.append(f'# HELP {p}_run_finished_timestamp_seconds Unix time the last run finished.')
+        lines.append(f'# TYPE {p}_run_finished_timestamp_seconds gauge')
+        lines.append(f'{p}_run_finished_timestamp_seconds {snapshot["finished_at"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, rate_limited: float = 0, retry_paused: float = 0):
+        return self.write_snapshot(self.snapshot(rate_limited, retry_paused))
+
+    def write_snapshot(self, snapshot: dict):
+        if self.json_path:
+            write_of(self.json_path, json.dumps(snapshot, indent=2))
+        if self.prometheus_path:
+            write_of(self.prometheus_path, self.prometheus(snapshot))
+
+        return snapshot
+
+def merge_of(snapshots: list[dict]):
+    operations: dict[tuple[str, str], dict] = {}
+    for snapshot in snapshots:
+        for v in snapshot['operations']:
+            key = (v['service'], v['operation'])
+            if key not in operations:
+                operations[key] = {**v, 'buckets': dict(v['buckets'])}
+                continue
+
+            operation = operations[key]
+            operation['requests'] += v['requests']
+            operation['errors'] += v['errors']
+            operation['seconds'] += v['seconds']
+            for le, count in v['buckets'].items():
+                operation['buckets'][le] = operation['buckets'].get(le, 0) + count
+
+    started = min((v['started_at'] for v in snapshots), default=time.time())
+    finished = max((v['finished_at'] for v in snapshots), default=time.time())
+
+    return {
+        'started_at': started,
+        'finished_at': finished,
+        'duration_seconds': finished - started,
+        'rate_limited_seconds': sum(v['rate_limited_seconds'] for v in snapshots),
+        'retry_paused_seconds': sum(v['retry_paused_seconds'] for v in snapshots),
+        'operations': [operations[k] for k in sorted(operations)]
+    }
+
+def operation_of(url: str):
+    return re.sub(
+        r'/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(?=/|$)',
+        '/{id}',
+        urlparse(url).path
+    )
+
+def labels_of(operation: dict, **extra: str):
+    labels = {'service': operation['service'], 'operation': operation['operation'], **extra}
+
+    return '{' + ','.join(
+        '%s="%s"' % (k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in labels.items()
+    ) + '}'
+
+def write_of(path: str, content: str):
+    path_temp = f'{path}.{os.getpid()}.tmp'
+
+    with open(path_temp, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+    os.replace(path_temp, path)
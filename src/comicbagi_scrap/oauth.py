@@ -0,0 +1,36 @@
+import os
+import json
+import hashlib
+
+class TokenCache:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, issuer: str, client_id: str, audience: str):
+        key = hashlib.sha256(f'{issuer}\n{client_id}\n{audience}'.encode()).hexdigest()
+
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, issuer: str, client_id: str, audience: str):
+        try:
+            with open(self.path(issuer, client_id, audience), encoding='utf-8') as f:
+                token = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(token, dict) or 'access_token' not in token or 'expires_at' not in token:
+            return None
+
+        return token
+
+    def put(self, issuer: str, client_id: str, audience: str, access_token: str, expires_at: float):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+        path = self.path(issuer, client_id, audience)
+        path_temp = f'{path}.{os.getpid()}.tmp'
+
+        fd = os.open(path_temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'access_token': access_token, 'expires_at': expires_at}, f)
+
+        os.replace(path_temp, path)
@@ -0,0 +1,238 @@
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from multiprocessing.managers import BaseManager
+from typing import Any, Mapping
+from urllib.parse import urlparse
+
+def host_of(url: str):
+    return urlparse(url).netloc or url
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+        self.adapted_rate: float | None = None
+        self.adapted_until = 0.0
+        self.blocked_until = 0.0
+
+        self.lock = threading.Lock()
+
+    def __refill(self, now: float):
+        rate = self.rate
+        if self.adapted_rate is not None:
+            if now < self.adapted_until:
+                rate = min(rate, self.adapted_rate)
+            else:
+                self.adapted_rate = None
+
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+        return rate
+
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            rate = self.__refill(now)
+
+            self.tokens -= 1
+
+            delay = 0.0
+            if self.tokens < 0:
+                delay = -self.tokens / rate
+
+            return max(delay, self.blocked_until - now)
+
+    def block(self, seconds: float):
+        with self.lock:
+            now = time.monotonic()
+            self.__refill(now)
+
+            self.tokens = min(self.tokens, 0)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def adapt(self, remaining: int, reset_in: float):
+        with self.lock:
+            now = time.monotonic()
+            self.__refill(now)
+
+            self.tokens = min(self.tokens, remaining)
+            if remaining < 1:
+                self.blocked_until = max(self.blocked_until, now + reset_in)
+            elif reset_in > 0:
+                self.adapted_rate = remaining / reset_in
+                self.adapted_until = now + reset_in
+
+class Coordinator:
+    def __init__(self):
+        self.buckets: dict[str, TokenBucket] = {}
+
+        self.lock = threading.Lock()
+
+    def bucket(self, host: str, rate: float, burst: float):
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if not bucket:
+                bucket = TokenBucket(rate, burst)
+                self.buckets[host] = bucket
+
+        return bucket
+
+    def reserve(self, host: str, rate: float, burst: float):
+        return self.bucket(host, rate, burst).reserve()
+
+    def block(self, host: str, rate: float, burst: float, seconds: float):
+        self.bucket(host, rate, burst).block(seconds)
+
+    def adapt(self, host: str, rate: float, burst: float, remaining: int, reset_in: float):
+        self.bucket(host, rate, burst).adapt(remaining, reset_in)
+
+class CoordinatorManager(BaseManager):
+    pass
+
+CoordinatorManager.register('Coordinator', Coordinator)
+
+class SharedTokenBucket:
+    def __init__(self, coordinator: Coordinator, host: str, rate: float, burst: float = 1):
+        self.coordinator = coordinator
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+
+    def reserve(self):
+        return self.coordinator.reserve(self.host, self.rate, self.burst)
+
+    def block(self, seconds: float):
+        self.coordinator.block(self.host, self.rate, self.burst, seconds)
+
+    def adapt(self, remaining: int, reset_in: float):
+        self.coordinator.adapt(self.host, self.rate, self.burst, remaining, reset_in)
+
+class RateLimiter:
+    def __init__(
+        self,
+        rates: Mapping[str, tuple[float, float]] | None = None,
+        default_rate: tuple[float, float] = (1, 1),
+        concurrency: Mapping[str, int] | None = None,
+        coordinator: Coordinator | None = None
+    ):
+        self.rates = {host_of(k): v for k, v in (rates or {}).items()}
+        self.default_rate = default_rate
+        self.concurrency = {host_of(k): v for k, v in (concurrency or {}).items()}
+        self.coordinator = coordinator
+
+        self.buckets: dict[str, TokenBucket | SharedTokenBucket] = {}
+        self.semaphores: dict[str, threading.BoundedSemaphore | None] = {}
+        self.waited = 0.0
+
+        self.lock = threading.Lock()
+
+    def configure(self, url: str, rate: float, burst: float = 1, concurrency: int | None = None):
+        host = host_of(url)
+
+        with self.lock:
+            self.rates.setdefault(host, (rate, burst))
+            if concurrency:
+                self.concurrency.setdefault(host, concurrency)
+
+    def bucket(self, url: str):
+        host = host_of(url)
+
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if not bucket:
+                if self.coordinator:
+                    bucket = SharedTokenBucket(self.coordinator, host, *self.rates.get(host, self.default_rate))
+                else:
+                    bucket = TokenBucket(*self.rates.get(host, self.default_rate))
+                self.buckets[host] = bucket
+
+        return bucket
+
+    def semaphore(self, url: str):
+        host = host_of(url)
+
+        with self.lock:
+            if host not in self.semaphores:
+                concurrency = self.concurrency.get(host)
+                self.semaphores[host] = threading.BoundedSemaphore(concurrency) if concurrency else None
+
+            return self.semaphores[host]
+
+    def acquire(self, url: str):
+        delay = self.bucket(url).reserve()
+
+        if delay > 0:
+            with self.lock:
+                self.waited += delay
+            time.sleep(delay)
+
+    def update(self, url: str, status: int, headers: Mapping[str, Any] | None):
+        if not headers:
+            return
+
+        headers = {k.lower(): v for k, v in headers.items()}
+        bucket = self.bucket(url)
+
+        retry_after = retry_after_of(headers)
+        if status in (429, 503) and retry_after is not None:
+            bucket.block(retry_after)
+            return
+
+        remaining = headers.get('x-ratelimit-remaining')
+        if remaining is None:
+            return
+
+        reset_in = 0.0
+        if 'x-ratelimit-retry-after' in headers:
+            reset_in = max(float(headers['x-ratelimit-retry-after']) - time.time(), 0)
+
+        bucket.adapt(int(remaining), reset_in)
+
+    def attach(self, client):
+        call_api = client.call_api
+
+        def limited_call_api(method, url, *args, **kwargs):
+            semaphore = self.semaphore(url)
+
+            if semaphore: semaphore.acquire()
+            try:
+                self.acquire(url)
+
+                response = call_api(method, url, *args, **kwargs)
+            finally:
+                if semaphore: semaphore.release()
+
+            self.update(url, response.status, response.getheaders())
+
+            return response
+
+        client.call_api = limited_call_api
+
+        return client
+
+def retry_after_of(headers: Mapping[str, Any]):
+    if 'retry-after' in headers:
+        value = str(headers['retry-after'])
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            pass
+
+    if 'x-ratelimit-retry-after' in headers:
+        return max(float(headers['x-ratelimit-retry-after']) - time.time(), 0)
+
+    return None
+
+def rate_of(value: str):
+    rate, _, burst = value.partition('/')
+
+    return float(rate), float(burst or max(float(rate), 1))
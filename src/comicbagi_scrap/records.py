@@ -0,0 +1,119 @@
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import comicbagi_openapi
+
+#
+# MangaDex
+#
+
+class Relationship:
+    __slots__ = ('id', 'type')
+
+    def __init__(self, id: str | None, type: str | None):
+        self.id = id
+        self.type = type
+
+class MangaAttributes:
+    __slots__ = ('links', 'available_translated_languages', 'created_at', 'updated_at')
+
+    def __init__(
+        self,
+        links: dict[str, str] | None,
+        available_translated_languages: list[str] | None,
+        created_at: str | None,
+        updated_at: str | None
+    ):
+        self.links = links
+        self.available_translated_languages = available_translated_languages
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+class Manga:
+    __slots__ = ('id', 'attributes')
+
+    def __init__(self, id: str | None, attributes: MangaAttributes | None):
+        self.id = id
+        self.attributes = attributes
+
+class ChapterAttributes:
+    __slots__ = ('chapter', 'translated_language', 'created_at', 'updated_at')
+
+    def __init__(
+        self,
+        chapter: str | None,
+        translated_language: str | None,
+        created_at: str | None,
+        updated_at: str | None
+    ):
+        self.chapter = chapter
+        self.translated_language = translated_language
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+class Chapter:
+    __slots__ = ('id', 'attributes', 'relationships')
+
+    def __init__(self, id: str | None, attributes: ChapterAttributes | None, relationships: list[Relationship]):
+        self.id = id
+        self.attributes = attributes
+        self.relationships = relationships
+
+def manga_of(value: dict[str, Any]):
+    attributes = value.get('attributes')
+    if attributes:
+        links = attributes.get('links')
+
+        attributes = MangaAttributes(
+            links if isinstance(links, dict) else None,
+            attributes.get('availableTranslatedLanguages'),
+            attributes.get('createdAt'),
+            attributes.get('updatedAt')
+        )
+
+    return Manga(value.get('id'), attributes or None)
+
+def chapter_of(value: dict[str, Any]):
+    attributes = value.get('attributes')
+    if attributes:
+        attributes = ChapterAttributes(
+            attributes.get('chapter'),
+            attributes.get('translatedLanguage'),
+            attributes.get('createdAt'),
+            attributes.get('updatedAt')
+        )
+
+    return Chapter(
+        value.get('id'),
+        attributes or None,
+        [Relationship(v.get('id'), v.get('type')) for v in value.get('relationships') or []]
+    )
+
+#
+# Scrap
+#
+
+class MangaRecord:
+    __slots__ = ('manga', 'offset', 'cursor')
+
+    def __init__(self, manga: Manga, offset: int | None, cursor: tuple[str | None, list[str]] | None):
+        self.manga = manga
+        self.offset = offset
+        self.cursor = cursor
+
+class ChapterRecord:
+    __slots__ = ('manga_id', 'chapter', 'link', 'page', 'last')
+
+    def __init__(
+        self,
+        manga_id: str,
+        chapter: Chapter,
+        link: 'comicbagi_openapi.Link | None',
+        page: int,
+        last: bool
+    ):
+        self.manga_id = manga_id
+        self.chapter = chapter
+        self.link = link
+        self.page = page
+        self.last = last
@@ -0,0 +1,169 @@
+import time
+import random
+import logging
+import threading
+import urllib3
+from typing import Any, Callable, Mapping, TypeVar
+
+from .ratelimit import host_of, retry_after_of
+
+T = TypeVar('T')
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 5, cooldown: float = 30):
+        self.threshold = max(threshold, 1)
+        self.cooldown = cooldown
+
+        self.failures = 0
+        self.opened_until = 0.0
+
+        self.lock = threading.Lock()
+
+    def delay(self):
+        with self.lock:
+            return max(self.opened_until - time.monotonic(), 0)
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures < self.threshold:
+                return False
+
+            # Half-open after the cooldown, a single failure opens it again
+
+            self.failures = self.threshold - 1
+            self.opened_until = time.monotonic() + self.cooldown
+
+            return True
+
+class RetryPolicy:
+    statuses = (429, 500, 502, 503, 504)
+    statuses_unprocessed = (429, 503)
+
+    methods_idempotent = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+    errors = (urllib3.exceptions.HTTPError, OSError)
+    errors_unsent = (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError)
+
+    def __init__(
+        self,
+        retries: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 60,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 30,
+        logger: logging.Logger | None = None
+    ):
+        self.retries = max(retries, 0)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.retried = 0
+        self.paused = 0.0
+
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.lock = threading.Lock()
+
+    def breaker(self, url: str):
+        host = host_of(url)
+
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if not breaker:
+                breaker = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+                self.breakers[host] = breaker
+
+        return breaker
+
+    def run(
+        self,
+        method: str,
+        url: str,
+        request: Callable[[], T],
+        headers_of: Callable[[T], Mapping[str, Any] | None] = lambda response: response.getheaders()
+    ) -> T:
+        breaker = self.breaker(url)
+
+        attempt = 0
+        while True:
+            self.__pause(breaker)
+
+            try:
+                response = request()
+            except self.errors as e:
+                self.__failure(url, breaker)
+                if attempt >= self.retries or not self.__repeatable(method, error=e):
+                    raise
+
+                delay = self.__backoff(attempt)
+                self.logger.warning('Retry %s %s in %.1fs after %s', method, url, delay, type(e).__name__)
+            else:
+                if response.status not in self.statuses:
+                    breaker.success()
+                    return response
+
+                self.__failure(url, breaker)
+                if attempt >= self.retries or not self.__repeatable(method, status=response.status):
+                    return response
+
+                headers = headers_of(response)
+                retry_after = retry_after_of({k.lower(): v for k, v in headers.items()}) if headers else None
+
+                delay = max(retry_after or 0, self.__backoff(attempt))
+                self.logger.warning('Retry %s %s in %.1fs after HTTP %s', method, url, delay, response.status)
+
+                response.read()
+
+            with self.lock:
+                self.retried += 1
+                self.paused += delay
+            time.sleep(delay)
+
+            attempt += 1
+
+    def attach(self, client):
+        call_api = client.call_api
+
+        def retried_call_api(method, url, *args, **kwargs):
+            return self.run(method, url, lambda: call_api(method, url, *args, **kwargs))
+
+        client.call_api = retried_call_api
+
+        return client
+
+    def __repeatable(self, method: str, status: int | None = None, error: Exception | None = None):
+        if method.upper() in self.methods_idempotent:
+            return True
+
+        # Writes are only repeated when the server cannot have applied them
+
+        if status is not None:
+            return status in self.statuses_unprocessed
+
+        return isinstance(getattr(error, 'reason', None) or error, self.errors_unsent)
+
+    def __backoff(self, attempt: int):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def __pause(self, breaker: CircuitBreaker):
+        delay = breaker.delay()
+        if delay <= 0:
+            return
+
+        with self.lock:
+            self.paused += delay
+        time.sleep(delay)
+
+    def __failure(self, url: str, breaker: CircuitBreaker):
+        if breaker.failure():
+            self.logger.warning(
+                'Circuit open for %s, pausing requests for %.0fs', host_of(url), self.breaker_cooldown
+            )
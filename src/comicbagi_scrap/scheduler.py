@@ -0,0 +1,121 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+from .metrics import Metrics
+
+class Write:
+    def __init__(self, key: str, fn: Callable, args: tuple, kwargs: dict[str, Any], after: list[str]):
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.after = after
+        self.dependents: list[str] = []
+        self.pending = len(after)
+
+class WriteGraph:
+    def __init__(self, concurrency: int = 4):
+        self.concurrency = max(concurrency, 1)
+
+        self.writes: dict[str, Write] = {}
+
+        self.lock = threading.Lock()
+
+    def has(self, key: str):
+        with self.lock:
+            return key in self.writes
+
+    def add(self, key: str, fn: Callable, *args, after: Iterable[str | None] = (), **kwargs):
+        with self.lock:
+            if key in self.writes:
+                return key
+
+            write = Write(key, fn, args, kwargs, [v for v in dict.fromkeys(after) if v and v in self.writes])
+            for v in write.after:
+                self.writes[v].dependents.append(key)
+            self.writes[key] = write
+
+        return key
+
+    def run(self):
+        with self.lock:
+            writes, self.writes = self.writes, {}
+
+        if not writes:
+            return
+
+        errors: list[BaseException] = []
+        done = threading.Condition()
+        remaining = len(writes)
+
+        def finish(write: Write, ok: bool):
+            nonlocal remaining
+
+            ready: list[Write] = []
+            with done:
+                remaining -= 1
+                for k in write.dependents:
+                    dependent = writes[k]
+                    if not ok:
+                        if dependent.pending >= 0:
+                            dependent.pending = -1
+                            ready.append(dependent)
+                        continue
+
+                    if dependent.pending > 0:
+                        dependent.pending -= 1
+                        if dependent.pending == 0:
+                            ready.append(dependent)
+                done.notify_all()
+
+            for v in ready:
+                if v.pending < 0:
+                    finish(v, False)
+                else:
+                    executor.submit(execute, v)
+
+        def execute(write: Write):
+            try:
+                write.fn(*write.args, **write.kwargs)
+            except BaseException as e:
+                with done:
+                    errors.append(e)
+                finish(write, False)
+            else:
+                finish(write, True)
+
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='comicbagi-write') as executor:
+            for write in [v for v in writes.values() if v.pending == 0]:
+                executor.submit(execute, write)
+
+            with done:
+                while remaining > 0:
+                    done.wait()
+
+        if errors:
+            raise errors[0]
+
+class Budget:
+    def __init__(self, seconds: float | None = None, requests: int | None = None):
+        self.seconds = seconds
+        self.requests = requests
+
+        self.deadline: float | None = None
+        self.metrics: Metrics | None = None
+        self.requests_started = 0
+
+    def start(self, metrics: Metrics | None = None):
+        self.deadline = time.monotonic() + self.seconds if self.seconds else None
+        self.metrics = metrics
+        self.requests_started = metrics.count() if metrics else 0
+
+    def exhausted(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+
+        if self.requests and self.metrics and self.metrics.count() - self.requests_started >= self.requests:
+            return True
+
+        return False
@@ -0,0 +1,51 @@
+import os
+import json
+import time
+import threading
+from typing import Iterable
+
+class Snapshot:
+    version = 1
+
+    def __init__(self, path: str, base: str, ttl: float = 24 * 60 * 60):
+        self.path = path
+        self.base = base
+        self.ttl = ttl
+
+        self.entries: dict[str, dict] = {}
+
+        self.lock = threading.Lock()
+
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+
+        if not isinstance(data, dict) or data.get('version') != self.version or data.get('base') != self.base:
+            data = {}
+
+        with self.lock:
+            self.entries = data.get('entries') or {}
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+
+        if not entry or entry['saved_at'] + self.ttl < time.time():
+            return None
+
+        return list(entry['values'])
+
+    def put(self, key: str, values: Iterable[str]):
+        with self.lock:
+            self.entries[key] = {'saved_at': time.time(), 'values': list(values)}
+
+            path_temp = f'{self.path}.{os.getpid()}.tmp'
+            with open(path_temp, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.version, 'base': self.base, 'entries': self.entries}, f)
+
+            os.replace(path_temp, self.path)
@@ -0,0 +1,141 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Mapping, TypeVar
+
+T = TypeVar('T')
+
+def prefetch(
+    fetch: Callable[[int], tuple[list[T], bool]],
+    pages: int = 2,
+    start: int = 1,
+    step: int = 1
+) -> Iterator[list[T]]:
+    buffer: queue.Queue = queue.Queue(maxsize=max(pages, 1))
+    stop = threading.Event()
+    done = object()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                buffer.put(value, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def produce():
+        page = start
+        try:
+            while not stop.is_set():
+                items, last = fetch(page)
+                put((items, None))
+                if last:
+                    break
+
+                page += step
+        except BaseException as e:
+            put((None, e))
+            return
+
+        put(done)
+
+    thread = threading.Thread(target=produce, name='mangadex-prefetch', daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            value = buffer.get()
+            if value is done:
+                return
+
+            items, error = value
+            if error:
+                raise error
+
+            yield items
+    finally:
+        stop.set()
+        thread.join()
+
+def paginate(
+    list_with_http_info: Callable[..., Any],
+    *args,
+    limit: int = 100,
+    concurrency: int = 4,
+    **kwargs
+) -> Iterator[Any]:
+    response = list_with_http_info(*args, page=1, limit=limit, **kwargs)
+    if not response.data:
+        return
+
+    yield from response.data
+
+    total_count = header_of(response.headers, 'x-total-count')
+    limit = int(header_of(response.headers, 'x-pagination-limit') or limit)
+
+    # Without a total the pages can only be walked one after another
+
+    if total_count is None:
+        page, data = 1, response.data
+        while len(data) >= limit:
+            page += 1
+            data = list_with_http_info(*args, page=page, limit=limit, **kwargs).data or []
+            yield from data
+        return
+
+    pages = -(-int(total_count) // limit)
+    if pages < 2:
+        return
+
+    def fetch(page: int):
+        return list_with_http_info(*args, page=page, limit=limit, **kwargs).data or []
+
+    executor = ThreadPoolExecutor(max(concurrency, 1), thread_name_prefix='comicbagi-paginate')
+    try:
+        for data in executor.map(fetch, range(2, pages + 1)):
+            yield from data
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+def keyset(
+    fetch: Callable[[str | None, int], list[T]],
+    key_of: Callable[[T], str | None],
+    id_of: Callable[[T], str | None],
+    limit: int,
+    cursor: tuple[str | None, list[str]] | None = None
+) -> Callable[[], tuple[list[tuple[T, tuple[str | None, list[str]]]], bool]]:
+    # MangaDex rejects offset + limit past 10,000, so long scans are paged by a sort timestamp instead.
+    # The since filter is inclusive, so the IDs already seen at the cursor timestamp are dropped and
+    # skipped by offset, which also gets past runs of items sharing a single timestamp.
+
+    since, ids = cursor or (None, [])
+
+    def page():
+        nonlocal since, ids
+
+        seen = set(ids)
+        response = fetch(since, len(ids))
+
+        items = []
+        for item in response:
+            item_id = id_of(item)
+            if not item_id or item_id in seen:
+                continue
+
+            key = key_of(item) or since
+            if key != since:
+                since, ids = key, []
+            ids = [*ids, item_id]
+
+            items.append((item, (since, ids)))
+
+        return items, len(response) < limit
+
+    return page
+
+def header_of(headers: Mapping[str, Any] | None, name: str):
+    for k, v in (headers or {}).items():
+        if k.lower() == name:
+            return v
+
+    return None
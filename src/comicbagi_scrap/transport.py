@@ -0,0 +1,70 @@
+import logging
+import urllib3
+from typing import Any, Mapping
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+class Transport:
+    def __init__(
+        self,
+        pool_size: int = 10,
+        pool_hosts: int = 10,
+        connect_timeout: float = 10,
+        read_timeout: float = 60,
+        http2: bool = False,
+        logger: logging.Logger | None = None
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+
+        if http2:
+            try:
+                from urllib3 import http2 as urllib3_http2
+
+                urllib3_http2.inject_into_urllib3()
+            except ImportError:
+                if logger: logger.warning('HTTP/2 is not available, using HTTP/1.1')
+
+        self.pool_manager = urllib3.PoolManager(
+            num_pools=pool_hosts,
+            maxsize=pool_size,
+            timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+        )
+
+    def attach(self, client):
+        client.rest_client.pool_manager = self.pool_manager
+
+        call_api = client.call_api
+
+        def pooled_call_api(method, url, *args, **kwargs):
+            if len(args) < 4 and kwargs.get('_request_timeout') is None:
+                kwargs['_request_timeout'] = self.timeout
+
+            return call_api(method, url, *args, **kwargs)
+
+        client.call_api = pooled_call_api
+
+        return client
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        fields: Mapping[str, Any] | None = None,
+        headers: Mapping[str, str] | None = None
+    ):
+        return self.pool_manager.request(
+            method,
+            url,
+            fields=fields,
+            headers=headers,
+            encode_multipart=False
+        )
+
+    def clear(self):
+        self.pool_manager.clear()
+
+def json_of(response: urllib3.HTTPResponse):
+    return json_loads(response.data)
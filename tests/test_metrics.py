@@ -0,0 +1,41 @@
+from comicbagi_scrap.metrics import Metrics
+
+class Response:
+    def __init__(self, status):
+        self.status = status
+
+class Client:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+
+    def param_serialize(self, method, resource_path, path_params=None):
+        url = 'http://comicbagi.local/api' + resource_path.format(**(path_params or {}))
+
+        return method, url, {}, None, []
+
+    def call_api(self, method, url, *args, **kwargs):
+        return Response(self.statuses.pop(0))
+
+def test_retries_keep_operation():
+    metrics = Metrics()
+    client = metrics.attach(Client([502, 200]), 'comicbagi')
+
+    method, url, *_ = client.param_serialize('GET', '/rest/comics/{comicCode}', {'comicCode': 'ABC'})
+    client.call_api(method, url)
+    client.call_api(method, url)
+
+    assert metrics.requests == {('comicbagi', 'GET /rest/comics/{comicCode}'): 2}
+    assert metrics.errors == {('comicbagi', 'GET /rest/comics/{comicCode}'): 1}
+
+def test_unserialized_call_named_by_path():
+    metrics = Metrics()
+    client = metrics.attach(Client([200, 200]), 'mangadex')
+
+    method, url, *_ = client.param_serialize('GET', '/rest/comics/{comicCode}', {'comicCode': 'ABC'})
+    client.call_api(method, url)
+    client.call_api('GET', 'http://api.mangadex.org/manga/00000000-0000-0000-0000-000000000001/feed?limit=1')
+
+    assert metrics.requests == {
+        ('mangadex', 'GET /rest/comics/{comicCode}'): 1,
+        ('mangadex', 'GET /manga/{id}/feed'): 1
+    }
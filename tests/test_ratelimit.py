@@ -0,0 +1,50 @@
+import pytest
+
+from comicbagi_scrap import ratelimit
+from comicbagi_scrap.ratelimit import TokenBucket
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+
+    return now
+
+def test_burst_then_rate(clock):
+    bucket = TokenBucket(2, 3)
+
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+def test_refill_capped_at_burst(clock):
+    bucket = TokenBucket(1, 2)
+    bucket.reserve()
+    bucket.reserve()
+
+    clock[0] += 60
+
+    assert [bucket.reserve() for _ in range(2)] == [0, 0]
+    assert bucket.reserve() == pytest.approx(1.0)
+
+def test_block(clock):
+    bucket = TokenBucket(10, 10)
+    bucket.block(5)
+
+    assert bucket.reserve() == pytest.approx(5)
+
+    clock[0] += 5
+
+    assert bucket.reserve() == 0
+
+def test_adapt_slows_until_reset(clock):
+    bucket = TokenBucket(10, 1)
+    bucket.adapt(2, 4)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(2)
+
+    clock[0] += 10
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1)
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from comicbagi_scrap.scheduler import WriteGraph
+
+def test_dependents_skipped_after_failure():
+    calls = []
+
+    def fail():
+        raise ValueError('comic')
+
+    graph = WriteGraph()
+    graph.add('comic', fail)
+    graph.add('chapter', calls.append, 'chapter', after=['comic'])
+    graph.add('chapter link', calls.append, 'chapter link', after=['chapter'])
+    graph.add('link', calls.append, 'link')
+
+    with pytest.raises(ValueError):
+        graph.run()
+
+    assert calls == ['link']
+
+def test_repeated_key_added_once():
+    calls = []
+
+    graph = WriteGraph()
+    assert graph.add('link', calls.append, 'first') == 'link'
+    assert graph.add('link', calls.append, 'second') == 'link'
+    assert graph.has('link')
+
+    graph.run()
+
+    assert calls == ['first']
+    assert not graph.has('link')
+
+def test_after_keys_from_earlier_graphs():
+    calls = []
+
+    graph = WriteGraph()
+    graph.add('comic', calls.append, 'comic')
+    graph.run()
+
+    # The comic was written by the previous run, the chapter does not wait for it
+    graph.add('chapter', calls.append, 'chapter', after=['comic', None])
+    graph.run()
+
+    assert calls == ['comic', 'chapter']
+
+def test_dependents_run_after_their_writes():
+    calls = []
+    lock = threading.Lock()
+
+    def write(key):
+        with lock:
+            calls.append(key)
+
+    graph = WriteGraph(4)
+    graph.add('comic', write, 'comic')
+    graph.add('link', write, 'link')
+    for i in range(8):
+        graph.add(f'chapter {i}', write, f'chapter {i}', after=['comic', 'link'])
+
+    graph.run()
+
+    assert len(calls) == 10
+    assert max(calls.index('comic'), calls.index('link')) < min(calls.index(f'chapter {i}') for i in range(8))
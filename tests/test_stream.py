@@ -0,0 +1,49 @@
+from comicbagi_scrap.stream import keyset
+
+class Feed:
+    def __init__(self, items):
+        self.items = sorted(items, key=lambda v: v[1])
+        self.calls = []
+
+    def fetch(self, since, offset, limit):
+        self.calls.append((since, offset))
+        items = [v for v in self.items if since is None or v[1] >= since]
+
+        return items[offset:offset + limit]
+
+def walk(page):
+    result = []
+    while True:
+        items, last = page()
+        result.extend(items)
+        if last:
+            return result
+
+def test_pages_by_cursor():
+    feed = Feed([(f'm{i}', f'2024-01-0{i}') for i in range(1, 8)])
+    page = keyset(lambda since, offset: feed.fetch(since, offset, 3), lambda v: v[1], lambda v: v[0], 3)
+
+    items = walk(page)
+
+    assert [v[0] for v, _ in items] == [f'm{i}' for i in range(1, 8)]
+    assert items[-1][1] == ('2024-01-07', ['m7'])
+
+def test_same_key_skipped_by_offset():
+    feed = Feed([(f'm{i}', '2024-01-01') for i in range(7)] + [('n', '2024-01-02')])
+    page = keyset(lambda since, offset: feed.fetch(since, offset, 3), lambda v: v[1], lambda v: v[0], 3)
+
+    items = walk(page)
+
+    assert [v[0] for v, _ in items] == [f'm{i}' for i in range(7)] + ['n']
+    assert feed.calls[1:3] == [('2024-01-01', 3), ('2024-01-01', 6)]
+
+def test_resume_from_cursor():
+    feed = Feed([('a', '2024-01-01'), ('b', '2024-01-02'), ('c', '2024-01-02'), ('d', '2024-01-03')])
+    page = keyset(lambda since, offset: feed.fetch(since, offset, 2), lambda v: v[1], lambda v: v[0], 2)
+    items, _ = page()
+
+    cursor = items[-1][1]
+    page = keyset(lambda since, offset: feed.fetch(since, offset, 2), lambda v: v[1], lambda v: v[0], 2, cursor)
+
+    assert cursor == ('2024-01-02', ['b'])
+    assert [v[0] for v, _ in walk(page)] == ['c', 'd']